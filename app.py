@@ -1,13 +1,14 @@
 import os
 
 import dash_mantine_components as dmc
-import plotly.io as pio
-from dash import Dash, dcc, Input, Output, callback, _dash_renderer, Patch, ctx, ALL, page_container, no_update, State, \
-    MATCH
+from dash import Dash, dcc, Input, Output, callback, _dash_renderer, ctx, ALL, page_container, no_update, State, \
+    MATCH, clientside_callback
 from dash_iconify import DashIconify
 from dotenv import load_dotenv
+from flask import request
 
-from app_config import query_to_filter, filter_to_query, query_to_col, col_to_query
+from app_config import query_to_filter, filter_to_query, query_to_col, col_to_query, grid_data, filter_df, sort_df, \
+    figure_template
 
 # load env variable to know if the app is local or deployed
 load_dotenv()
@@ -25,6 +26,48 @@ app = Dash(
 server = app.server
 page_container.style = {"flex": 1}
 
+# Note: Dash names its assets blueprint from the routes prefix, e.g. '_dash_assets' for '/' or '_gcf_dash_assets'
+# for '/gcf/', as for its routes endpoints
+assets_endpoint = app.config.routes_pathname_prefix.replace('/', '_').replace('.', '_') + 'dash_assets.static'
+# Note: the layout and the callbacks dependencies only change with the code and the datasets of the process
+static_endpoints = [app.config.routes_pathname_prefix + name for name in ['_dash-layout', '_dash-dependencies']]
+
+# brotli (gzip for older browsers) compression of the layouts, callbacks responses and assets above
+# COMPRESS_MIN_SIZE bytes, instead of the gzip only compress option of Dash. Skipped if flask-compress is not installed
+try:
+    from flask_compress import Compress
+
+    server.config.update(
+        COMPRESS_ALGORITHM=['br', 'gzip'], COMPRESS_MIN_SIZE=int(os.getenv('COMPRESS_MIN_SIZE', 500)),
+        # the assets files are streamed, still answer their conditional requests with a 304
+        COMPRESS_STREAMING_ENDPOINT_CONDITIONAL=['static', assets_endpoint],
+    )
+    Compress(server)
+except ImportError:
+    pass
+
+
+# Note: registered after Compress, so run before it on the uncompressed response
+@server.after_request
+def add_cache_headers(response):
+    if response.status_code != 200:
+        return response
+
+    # the assets urls are versioned by Dash with their modification time (?m=...), so they can be cached for good
+    if request.endpoint == assets_endpoint and 'm' in request.args:
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = 31536000  # 1 year
+        response.cache_control.immutable = True
+    # revalidated by the browser with their strong ETag, to get a 304 without body when unchanged: from
+    # make_conditional() when not compressed, else from Compress once it suffixed the ETag with the encoding
+    elif request.endpoint in static_endpoints:
+        response.cache_control.no_cache = True
+        response.add_etag()
+        response = response.make_conditional(request)
+    return response
+
+
 header = dmc.Group(
     [
         dmc.Anchor(
@@ -85,6 +128,9 @@ app.layout = dmc.MantineProvider(
                       BASE_PATHNAME + "countries": '', BASE_PATHNAME + "readiness": '',
                       BASE_PATHNAME + "funded-activities": '', BASE_PATHNAME + "entities": ''}
                   ),
+        # figure templates sent once with the layout, to switch the theme of the figures in the browser
+        dcc.Store(id="figure-templates-store",
+                  data={theme: figure_template(theme) for theme in ['light', 'dark']}),
     ],
     id="mantine-provider",
     theme={
@@ -167,30 +213,56 @@ def reset_grid_filter(_):
     return {}
 
 
+# Note: only triggered with the infinite row model (GRID_ROW_MODEL='infinite'), when the grid needs a block of rows
+# after scrolling, filtering or sorting
 @callback(
-    Output("mantine-provider", "forceColorScheme"),
-    Output({'type': 'grid', 'index': ALL}, "className"),
-    Output({'type': 'figure', 'subtype': ALL, 'index': ALL}, "figure"),
-    Input("color-scheme-switch", "checked"),
+    Output({"type": "grid", "index": MATCH}, "getRowsResponse"),
+    Input({"type": "grid", "index": MATCH}, "getRowsRequest"),
+    prevent_initial_call=True
 )
-def switch_theme(checked):
-    main_layout_theme = "light" if checked else "dark"
+def infinite_scroll_rows(rows_request):
+    if not rows_request or ctx.triggered_id['index'] not in grid_data:
+        return no_update
+
+    dff = filter_df(grid_data[ctx.triggered_id['index']], rows_request.get('filterModel'))
+    dff = sort_df(dff, rows_request.get('sortModel'))
+    return {
+        'rowData': dff.iloc[rows_request['startRow']:rows_request['endRow']].to_dict("records"),
+        'rowCount': len(dff)
+    }
 
-    grids_theme = ["ag-theme-quartz" if checked else "ag-theme-quartz-dark"] * len(ctx.outputs_list[1])
 
-    fig_patch_list = []
-    for fig in ctx.outputs_list[2]:
-        fig_patch = Patch()
-        fig_patch["layout"]["template"] = pio.templates[f"mantine_{'light' if checked else 'dark'}"]
+# Note: clientside to switch the theme without any server round trip, the figures being patched with the templates
+# of figure-templates-store
+clientside_callback(
+    """
+    function(checked, templates) {
+        const outputs = dash_clientside.callback_context.outputs_list;
 
-        if fig['id']['subtype'] == 'map':
-            fig_patch["layout"]['geo']['landcolor'] = '#f1f3f5' if checked else '#1f1f1f'
-        if fig['id']['subtype'] == 'treemap':
-            fig_patch["data"][0]["root"]["color"] = "rgba(0,0,0,0.1)" if checked else "rgba(255,255,255,0.1)"
+        const gridsTheme = outputs[1].map(() => checked ? "ag-theme-quartz" : "ag-theme-quartz-dark");
 
-        fig_patch_list.append(fig_patch)
+        const figPatchList = outputs[2].map((fig) => {
+            const figPatch = new dash_clientside.Patch();
+            figPatch.assign(["layout", "template"], templates[checked ? "light" : "dark"]);
 
-    return main_layout_theme, grids_theme, fig_patch_list
+            if (fig.id.subtype === "map") {
+                figPatch.assign(["layout", "geo", "landcolor"], checked ? "#f1f3f5" : "#1f1f1f");
+            }
+            if (fig.id.subtype === "treemap") {
+                figPatch.assign(["data", 0, "root", "color"], checked ? "rgba(0,0,0,0.1)" : "rgba(255,255,255,0.1)");
+            }
+            return figPatch.build();
+        });
+
+        return [checked ? "light" : "dark", gridsTheme, figPatchList];
+    }
+    """,
+    Output("mantine-provider", "forceColorScheme"),
+    Output({'type': 'grid', 'index': ALL}, "className"),
+    Output({'type': 'figure', 'subtype': ALL, 'index': ALL}, "figure"),
+    Input("color-scheme-switch", "checked"),
+    State("figure-templates-store", "data"),
+)
 
 
 if __name__ == '__main__':
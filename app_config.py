@@ -1,15 +1,43 @@
+import hashlib
+import json
 import os
+import shutil
+import threading
+from collections import OrderedDict
 from datetime import datetime
+from functools import cache
 from urllib.parse import parse_qs
 
 import numpy as np
 import pandas as pd
 import dash_mantine_components as dmc
+import plotly.io as pio
+from dotenv import load_dotenv
+from plotly.io.json import to_json_plotly
 
 # Main constants #####################################################################################
 PRIMARY_COLOR = '#15a14a'
 SECONDARY_COLOR = '#084081'
 
+# load env variable to know the row model of the grids: 'clientSide' (default) sends the whole datasets to the
+# browser, 'infinite' keeps them on the server and sends the filtered/sorted rows by blocks, on demand
+load_dotenv()
+GRID_ROW_MODEL = os.getenv('GRID_ROW_MODEL', 'clientSide')
+# the charts get the grid rows either from the grid filter model evaluated on the server (always the case with the
+# infinite row model), or from the virtualRowData sent back by the browser (default)
+CHARTS_FROM_FILTER_MODEL = os.getenv('CHARTS_FROM_FILTER_MODEL', 'false').lower() == 'true' or \
+                           GRID_ROW_MODEL == 'infinite'
+GRID_ROWS_PROP = 'filterModel' if CHARTS_FROM_FILTER_MODEL else 'virtualRowData'
+# bounds of the process-level cache of the grid rows frames shared by the charts callbacks, see FramesCache
+FRAMES_CACHE_MAX_ENTRIES = int(os.getenv('FRAMES_CACHE_MAX_ENTRIES', 128))
+FRAMES_CACHE_MAX_MB = float(os.getenv('FRAMES_CACHE_MAX_MB', 256))
+# keep the str columns of the datasets in Arrow buffers instead of one Python object per cell, so the forked workers
+# of a preloaded server (see gunicorn.conf.py) read them without the refcount writes that copy the shared pages
+ARROW_STRINGS = os.getenv('ARROW_STRINGS', 'false').lower() == 'true'
+# store the prepared datasets as uncompressed Arrow IPC files, with Arrow backed str columns, and memory-map them
+# instead of reading them in memory: all the processes of a host share the same physical pages of the files
+DATASETS_MMAP = os.getenv('DATASETS_MMAP', 'false').lower() == 'true'
+
 # Main constants/functions #####################################################################################
 # custom header template to add an info icon to emphasize tooltips for that header
 header_template_with_icon = """
@@ -52,6 +80,21 @@ def text_carousel(text_list: list[str], carousel_id: str):
     )
 
 
+@cache
+def figure_template(theme):
+    # plotly JSON of the mantine figure template of the theme, see dmc.add_figure_templates() in app.py
+    return pio.templates[f"mantine_{theme}"].to_plotly_json()
+
+
+def themed_figure(base_fig, theme, **layout):
+    """
+    Figure of a render, from base_fig the plotly JSON of a figure built at import, with the template of the theme
+    and the given theme dependent layout props. base_fig is shared by all the renders and never modified, the
+    overlay only copying its top level dicts, without validating the figure again.
+    """
+    return {**base_fig, 'layout': {**base_fig['layout'], 'template': figure_template(theme), **layout}}
+
+
 def format_money_number_si(number):
     units = ['', 'k', 'M', 'B']
     magnitude = 0
@@ -61,90 +104,254 @@ def format_money_number_si(number):
     return f"${number:.1f}{units[magnitude]}"
 
 
-# Load datasets #####################################################################################
+def format_money_numbers_si(numbers):
+    # format_money_number_si of a whole array/Series at once, as a list of str: the numbers are divided by 1000 with the
+    # same steps as the scalar loop, only while they are still >= 1000, to round them to the same labels
+    numbers = np.array(numbers, dtype=float)
+    units = np.array(['', 'k', 'M', 'B'])
+    magnitude = np.zeros(numbers.shape, dtype=np.int64)
+    for _ in range(len(units) - 1):
+        larger = np.abs(numbers) >= 1000
+        numbers[larger] /= 1000.0
+        magnitude += larger
+    return [f"${number:.1f}{unit}" for number, unit in zip(numbers.tolist(), units[magnitude].tolist())]
 
-assets_folder = os.path.join(os.path.abspath(os.curdir), 'assets')
 
-df_countries_ISO_codes = pd.read_csv(f'{assets_folder}/countries_codes_and_coordinates.csv')
-df_countries = pd.read_csv(f'{assets_folder}/GCF-countries.csv')
-df_entities = pd.read_csv(f'{assets_folder}/GCF-entities.csv')
-df_readiness = pd.read_csv(
-    f'{assets_folder}/GCF-readiness.csv', date_format={'Approved Date': '%b %d, %Y'}, parse_dates=['Approved Date']
-)
-df_FA = pd.read_csv(f'{assets_folder}/GCF-FA.csv')
-
-# Country Data #####################################################################################
-df_countries.rename(columns={"LDCs": "LDC"}, inplace=True)
-df_countries.fillna(value=0, inplace=True)
-df_countries['AS'] = df_countries['Region'] == 'Africa'
-
-# add cols for sum by region
-region_sum = df_countries.groupby('Region')[['# RP', '# FA', 'RP Financing $', 'FA Financing $']].sum()
-df_countries = df_countries.assign(**{
-    f'{col} region_sum': df_countries['Region'].apply(lambda row: region_sum[col][row])
-    for col in ['# RP', '# FA', 'RP Financing $', 'FA Financing $']
-})
-
-# add 'priority states' col
-df_countries['Priority States'] = df_countries[['SIDS', 'LDC', 'AS']].any(axis=1)
-
-# Entities Data #####################################################################################
-# fix bad data
-df_entities['BM'] = df_entities['BM'].fillna('0')
-df_entities['Entity'] = df_entities['Entity'].str.replace('_', ' ')
-df_entities['Size'] = df_entities['Size'].str.replace('Medium, Small', 'Medium')
-# convert the BM col as int to be easier to handle
-df_entities['BM'] = df_entities['BM'].str.replace('B.', '', regex=False).astype(int)
-# add ISO3 code
-df_entities = pd.merge(
-    df_entities, df_countries_ISO_codes[['Country', 'Alpha-3 code']], on='Country', how='left')
-
-# extract entities info that will be used for readiness and FA
-entities_details = df_entities.drop(columns=['Stage', 'BM', '# Approved', 'FA Financing'])
-entities_details.rename(columns={"Name": "Entity Name", "Country": "Entity Country"}, inplace=True)
-
-# Readiness Data #####################################################################################
-
-df_readiness.rename(columns={"LDCs": "LDC"}, inplace=True)
-df_readiness['Delivery Partner'] = df_readiness['Delivery Partner'].str.replace('_', ' ')
-df_readiness['Region'] = (
-    df_readiness['Region'].str
-    .replace('AF', 'Africa')
-    .replace('AP', 'Asia-Pacific')
-    .replace('EE', 'Eastern Europe')
-    .replace('LAC', 'Latin America and the Caribbean')
-    .replace('WE', 'Western Europe and Others')
-)
-df_readiness['AS'] = df_readiness['Region'] == 'Africa'
-
-# Add a col to have dates in ISO string to parse it with dag
-df_readiness['Approved Date str'] = df_readiness['Approved Date'].dt.strftime('%Y-%m-%d')
-# add partner info
-df_readiness = pd.merge(
-    df_readiness, entities_details,
-    left_on='Delivery Partner', right_on='Entity', how='left')
-df_readiness.drop('Entity', axis=1, inplace=True)
-df_readiness.rename(columns={"Entity Country": "Partner Country", "Entity Name": "Partner Name"}, inplace=True)
-# fill missing Partner Name with '*Details Missing*' that will be used on hover
-df_readiness['Partner Name'] = df_readiness['Partner Name'].fillna('*Details Missing*')
-
-# Funded Activities Data #####################################################################################
-
-# add entity name for hover
-df_FA['Entity'] = df_FA['Entity'].str.replace('_', ' ')
-df_FA = pd.merge(df_FA, entities_details[['Entity', "Entity Name"]], on='Entity', how='left')
-# fill missing data with '*Details Missing*'
-df_FA['Entity Name'] = df_FA['Entity Name'].fillna('*Details Missing*')
-df_FA['Project Size'] = df_FA['Project Size'].fillna('*Missing*')
-# convert the BM col as int to be easier to handle
-df_FA['BM'] = df_FA['BM'].str.replace('B.', '', regex=False).astype(int)
-# add priority states
-priority_countries = df_countries[df_countries['Priority States']]['Country Name'].tolist()
-df_FA['Priority States'] = df_FA['Countries'].apply(
-    lambda countries: any(country.strip() in priority_countries for country in countries.split(','))
+# Load datasets #####################################################################################
+
+# the datasets can be read from another folder with the same CSVs, like the scaled data of benchmarks/generate_data.py
+assets_folder = os.path.abspath(os.getenv('GCF_DATA_FOLDER', os.path.join(os.curdir, 'assets')))
+
+# the prepared datasets are cached in a columnar format (Feather), keyed by a hash of the source CSVs,
+# so that each worker only parses and cleans the CSVs when the sources changed
+datasets_cache_folder = os.path.join(os.path.abspath(os.curdir), '.cache', 'datasets')
+# NOTE: bump the version when the preparation below changes, to invalidate the existing caches
+DATASETS_PIPELINE_VERSION = '2'
+datasets_sources = [
+    'countries_codes_and_coordinates.csv', 'GCF-countries.csv', 'GCF-entities.csv', 'GCF-readiness.csv', 'GCF-FA.csv'
+]
+datasets_names = ['df_countries', 'df_entities', 'df_readiness', 'df_FA', 'entities_details']
+
+
+def prepare_datasets(folder):
+    df_countries_ISO_codes = pd.read_csv(f'{folder}/countries_codes_and_coordinates.csv')
+    df_countries = pd.read_csv(f'{folder}/GCF-countries.csv')
+    df_entities = pd.read_csv(f'{folder}/GCF-entities.csv')
+    df_readiness = pd.read_csv(
+        f'{folder}/GCF-readiness.csv', date_format={'Approved Date': '%b %d, %Y'}, parse_dates=['Approved Date']
+    )
+    df_FA = pd.read_csv(f'{folder}/GCF-FA.csv')
+
+    # Country Data #####################################################################################
+    df_countries.rename(columns={"LDCs": "LDC"}, inplace=True)
+    df_countries.fillna(value=0, inplace=True)
+    df_countries['AS'] = df_countries['Region'] == 'Africa'
+
+    # add cols for sum by region
+    region_sum = df_countries.groupby('Region')[['# RP', '# FA', 'RP Financing $', 'FA Financing $']].transform('sum')
+    df_countries = df_countries.join(region_sum.add_suffix(' region_sum'))
+
+    # add 'priority states' col
+    df_countries['Priority States'] = df_countries[['SIDS', 'LDC', 'AS']].any(axis=1)
+
+    # Entities Data #####################################################################################
+    # fix bad data
+    df_entities['BM'] = df_entities['BM'].fillna('0')
+    df_entities['Entity'] = df_entities['Entity'].str.replace('_', ' ')
+    df_entities['Size'] = df_entities['Size'].str.replace('Medium, Small', 'Medium')
+    # convert the BM col as int to be easier to handle
+    df_entities['BM'] = df_entities['BM'].str.replace('B.', '', regex=False).astype(int)
+    # add ISO3 code
+    df_entities = pd.merge(
+        df_entities, df_countries_ISO_codes[['Country', 'Alpha-3 code']], on='Country', how='left')
+
+    # extract entities info that will be used for readiness and FA
+    entities_details = df_entities.drop(columns=['Stage', 'BM', '# Approved', 'FA Financing'])
+    entities_details.rename(columns={"Name": "Entity Name", "Country": "Entity Country"}, inplace=True)
+
+    # Readiness Data #####################################################################################
+
+    df_readiness.rename(columns={"LDCs": "LDC"}, inplace=True)
+    df_readiness['Delivery Partner'] = df_readiness['Delivery Partner'].str.replace('_', ' ')
+    df_readiness['Region'] = (
+        df_readiness['Region'].str
+        .replace('AF', 'Africa')
+        .replace('AP', 'Asia-Pacific')
+        .replace('EE', 'Eastern Europe')
+        .replace('LAC', 'Latin America and the Caribbean')
+        .replace('WE', 'Western Europe and Others')
+    )
+    df_readiness['AS'] = df_readiness['Region'] == 'Africa'
+
+    # Add a col to have dates in ISO string to parse it with dag
+    df_readiness['Approved Date str'] = df_readiness['Approved Date'].dt.strftime('%Y-%m-%d')
+    # add partner info
+    df_readiness = pd.merge(
+        df_readiness, entities_details,
+        left_on='Delivery Partner', right_on='Entity', how='left')
+    df_readiness.drop('Entity', axis=1, inplace=True)
+    df_readiness.rename(columns={"Entity Country": "Partner Country", "Entity Name": "Partner Name"}, inplace=True)
+    # fill missing Partner Name with '*Details Missing*' that will be used on hover
+    df_readiness['Partner Name'] = df_readiness['Partner Name'].fillna('*Details Missing*')
+
+    # Funded Activities Data #####################################################################################
+
+    # add entity name for hover
+    df_FA['Entity'] = df_FA['Entity'].str.replace('_', ' ')
+    df_FA = pd.merge(df_FA, entities_details[['Entity', "Entity Name"]], on='Entity', how='left')
+    # fill missing data with '*Details Missing*'
+    df_FA['Entity Name'] = df_FA['Entity Name'].fillna('*Details Missing*')
+    df_FA['Project Size'] = df_FA['Project Size'].fillna('*Missing*')
+    # convert the BM col as int to be easier to handle
+    df_FA['BM'] = df_FA['BM'].str.replace('B.', '', regex=False).astype(int)
+    # add priority states
+    priority_countries = set(df_countries[df_countries['Priority States']]['Country Name'])
+    # one row per (project, country), the index keeping the project row
+    fa_countries = df_FA['Countries'].str.split(',').explode().str.strip()
+    df_FA['Priority States'] = fa_countries.isin(priority_countries).groupby(level=0).any()
+    # add multi country
+    df_FA['Multi Country'] = fa_countries.groupby(level=0).size() > 1
+
+    # default order in the grids, set here rather than by sorting the loaded frames in place, which would copy
+    # the memory-mapped ones. Stable to keep the same order of the duplicated readiness refs for any dtype
+    df_entities.sort_values('Entity', inplace=True, na_position='last')
+    df_readiness.sort_values('Ref #', inplace=True, kind='stable', na_position='last')
+    df_FA.sort_values('Ref #', inplace=True, na_position='last')
+
+    return {
+        'df_countries': df_countries, 'df_entities': df_entities, 'df_readiness': df_readiness, 'df_FA': df_FA,
+        'entities_details': entities_details
+    }
+
+
+def datasets_hash(folder):
+    sha = hashlib.sha256(DATASETS_PIPELINE_VERSION.encode())
+    for source in datasets_sources:
+        with open(f'{folder}/{source}', 'rb') as f:
+            sha.update(f.read())
+    return sha.hexdigest()[:16]
+
+
+def datasets_cache_path(sources_hash):
+    # the memory-mapped store has its own files, written uncompressed
+    return f'{datasets_cache_folder}/{sources_hash}' + ('-mmap' if DATASETS_MMAP else '')
+
+
+def save_datasets_cache(datasets, cache_path):
+    # write in a temporary folder then rename it, so concurrent workers never read a partially written cache
+    tmp_path = f'{cache_path}.tmp-{os.getpid()}'
+    os.makedirs(tmp_path, exist_ok=True)
+    for name in datasets_names:
+        if DATASETS_MMAP:
+            # compressed buffers would be decompressed in memory by each process
+            arrow_strings(datasets[name]).to_feather(f'{tmp_path}/{name}.feather', compression='uncompressed')
+        else:
+            datasets[name].to_feather(f'{tmp_path}/{name}.feather')
+    try:
+        os.rename(tmp_path, cache_path)
+    except OSError:  # already written by another worker
+        shutil.rmtree(tmp_path, ignore_errors=True)
+
+
+def load_datasets_cache(cache_path):
+    if not os.path.isdir(cache_path):
+        return None
+    # NOTE: Arrow reads the missing values of object columns back as None, restore the NaN of the CSV pipeline
+    return {name: pd.read_feather(f'{cache_path}/{name}.feather').fillna(np.nan) for name in datasets_names}
+
+
+def load_datasets_mmap(cache_path):
+    if not os.path.isdir(cache_path):
+        return None
+    import pyarrow as pa
+    from pyarrow import feather
+
+    # the str columns wrap the mapped Arrow arrays, the other ones are viewed without copy when they have no
+    # missing values (split_blocks avoids the copies of the blocks consolidation). The frames are read-only.
+    str_dtype = pd.StringDtype('pyarrow')
+    arrow_dtypes = {pa.string(): str_dtype, pa.large_string(): str_dtype}
+    return {
+        name: feather.read_table(f'{cache_path}/{name}.feather', memory_map=True).to_pandas(
+            split_blocks=True, types_mapper=arrow_dtypes.get)
+        for name in datasets_names
+    }
+
+
+def load_datasets(folder, sources_hash):
+    cache_path = datasets_cache_path(sources_hash)
+    load_cache = load_datasets_mmap if DATASETS_MMAP else load_datasets_cache
+    try:
+        datasets = load_cache(cache_path)
+        if datasets is not None:
+            return datasets
+    # corrupted cache or pyarrow not installed, fall back to the CSV pipeline
+    except (OSError, ValueError, ImportError):
+        pass
+
+    datasets = prepare_datasets(folder)
+    try:
+        save_datasets_cache(datasets, cache_path)
+        if DATASETS_MMAP:
+            # map the files just written rather than keeping the frames of this process
+            return load_datasets_mmap(cache_path)
+    except (OSError, ValueError, ImportError):
+        pass
+    return datasets
+
+
+def arrow_strings(df):
+    """Convert the object columns holding only str (and missing values) to the pyarrow backed str dtype"""
+    str_cols = [
+        col for col in df.select_dtypes('object').columns
+        if pd.api.types.infer_dtype(df[col], skipna=True) == 'string'
+    ]
+    return df.astype({col: 'string[pyarrow]' for col in str_cols})
+
+
+DATASETS_HASH = datasets_hash(assets_folder)
+# whether the cache was already there, or has been built by this import
+datasets_cache_existed = os.path.isdir(datasets_cache_path(DATASETS_HASH))
+datasets = load_datasets(assets_folder, DATASETS_HASH)
+# NOTE: the memory-mapped datasets already have Arrow backed str columns, and astype() would copy them in memory
+if ARROW_STRINGS and not DATASETS_MMAP:
+    datasets = {name: arrow_strings(df) for name, df in datasets.items()}
+df_countries = datasets['df_countries']
+df_entities = datasets['df_entities']
+df_readiness = datasets['df_readiness']
+df_FA = datasets['df_FA']
+entities_details = datasets['entities_details']
+
+
+# Countries aggregation cube ########################################################################################
+
+# every combination of the flags and region of df_countries with at least one country, the countries being the leaves
+# of the cube through their cell code, so the sums over any subset of countries are bincounts instead of groupbys
+countries_cube_dims = ['Priority States', 'SIDS', 'LDC', 'AS', 'Region']
+countries_cube_measures = ['# RP', '# FA', 'RP Financing $', 'FA Financing $']
+countries_cube_grouped = df_countries.groupby(countries_cube_dims)
+countries_cube_cells = countries_cube_grouped.size().index.to_frame(index=False)
+# own copy of the leaves, indexed as df_countries, which stays valid if the latter is sorted in place
+countries_cube_leaves = df_countries[countries_cube_measures].fillna(0).assign(
+    cell=countries_cube_grouped.ngroup()
 )
-# add multi country
-df_FA['Multi Country'] = df_FA['Countries'].apply(lambda countries: len(countries.split(',')) > 1)
+
+
+def countries_cube_sums(rows_index):
+    """
+    Sums of the measures by cell of the cube for the df_countries rows of rows_index, same as grouping these rows
+    by countries_cube_dims: sorted cells without any row dropped, indexed by cell code.
+    """
+    positions = countries_cube_leaves.index.get_indexer(rows_index)
+    leaves = countries_cube_leaves.take(positions[positions >= 0])  # -1 for the rows not in df_countries
+    leaves = leaves[leaves['cell'] >= 0]  # missing dims, dropped by groupby as well
+    codes = leaves['cell'].to_numpy()
+    size = len(countries_cube_cells)
+
+    sums = pd.DataFrame({
+        col: np.bincount(codes, weights=leaves[col].to_numpy(), minlength=size).astype(leaves[col].dtype)
+        for col in countries_cube_measures
+    })
+    return sums[np.bincount(codes, minlength=size) > 0]
 
 
 # URL queries to grid filters and the opposite #################################################################
@@ -160,6 +367,14 @@ def parse_as_number(value):
             return None  # Not a valid number
 
 
+# parse 'YYYY-MM-DD' str to the grid date filter format
+def parse_as_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d %H:%M:%S')
+    except ValueError:
+        return None  # Not a valid date
+
+
 # def app wide variables that will be populated in Grids scrips
 # those variables are used to map query params names to col names
 query_to_col = {}
@@ -202,6 +417,20 @@ def query_to_filter(query, query_to_col):
                 if value in ['true', 'false']:
                     filterModel[query_to_col[param]['field']] = {'filterType': 'text', 'type': value}
 
+            # AND of number conditions, each value with its operator in the same order, like the bins of the
+            # FA histogram: ?FAfin=10&FAfinOperator=greaterThanOrEqual&FAfin=20&FAfinOperator=lessThan
+            elif query_to_col[param]['type'] == 'num' and len(values) > 1:
+                operators = ['greaterThan', 'lessThan', 'equals', 'notEqual', 'greaterThanOrEqual', 'lessThanOrEqual']
+                conditions = [
+                    {'filterType': 'number', 'type': operator, 'filter': parse_as_number(value)}
+                    for value, operator in zip(values, query_params.get(param + 'Operator', []))
+                ]
+                # process only if every value is a number with a valid operator else skip
+                if len(conditions) == len(values) and \
+                        all(cond['filter'] is not None and cond['type'] in operators for cond in conditions):
+                    filterModel[query_to_col[param]['field']] = {
+                        'filterType': 'number', 'operator': 'AND', 'conditions': conditions}
+
             # queries examples: ?RPnb=10, ?RPnb=10-20, ?RPnb=10&RPnbOperator=greaterThan
             elif query_to_col[param]['type'] == 'num':
                 # try to split in case of range
@@ -228,6 +457,32 @@ def query_to_filter(query, query_to_col):
                         filterModel[query_to_col[param]['field']] = {
                             'filterType': 'number', 'type': 'inRange', 'filter': values[0], 'filterTo': values[1]}
 
+            # queries examples: ?approvedDate=2020-01-31, ?approvedDate=2020-01-31..2021-01-01,
+            # ?approvedDate=2020-01-31&approvedDateOperator=greaterThan
+            elif query_to_col[param]['type'] == 'date':
+                # try to split in case of range, the dates having '-'
+                values = values[0].split('..')
+                if len(values) == 1:
+                    value = parse_as_date(values[0])
+                    # process only if value is a date else skip
+                    if value is not None:
+                        # check if operator is provided and its value is valid else operator default to 'equals'
+                        operators = ['greaterThan', 'lessThan', 'equals', 'notEqual']
+                        if param + 'Operator' in query_params and query_params[param + 'Operator'][0] in operators:
+                            operator = query_params[param + 'Operator'][0]
+                        else:
+                            operator = 'equals'
+
+                        filterModel[query_to_col[param]['field']] = {
+                            'filterType': 'date', 'type': operator, 'dateFrom': value, 'dateTo': None}
+                # range like ?approvedDate=2020-01-31..2021-01-01
+                elif len(values) == 2:
+                    values = [parse_as_date(values[0]), parse_as_date(values[1])]
+                    # process only if values are both a date else skip
+                    if values[0] is not None and values[1] is not None:
+                        filterModel[query_to_col[param]['field']] = {
+                            'filterType': 'date', 'type': 'inRange', 'dateFrom': values[0], 'dateTo': values[1]}
+
     return filterModel
 
 
@@ -250,11 +505,335 @@ def filter_to_query(filter_model, col_to_query):
                     queries_list += [f"{col_to_query[col]}={col_filter['filter']}"]
 
         elif col_filter['filterType'] == 'number':
-            if col_filter['type'] == 'inRange':  # range has 'filter' and 'filterTo'
+            if 'conditions' in col_filter:
+                # only the AND of conditions with a value can be written as a query, the others kept only in the grid
+                if col_filter['operator'] != 'AND' or \
+                        any(cond['type'] in ['inRange', 'blank', 'notBlank'] for cond in col_filter['conditions']):
+                    continue
+                for cond in col_filter['conditions']:
+                    queries_list += [
+                        f"{col_to_query[col]}={cond['filter']}", f"{col_to_query[col]}Operator={cond['type']}"]
+            elif col_filter['type'] == 'inRange':  # range has 'filter' and 'filterTo'
                 queries_list += [f"{col_to_query[col]}={col_filter['filter']}-{col_filter['filterTo']}"]
             else:
                 queries_list += [f"{col_to_query[col]}={col_filter['filter']}"]
                 # no need to add operator when 'equals' as it is the default, that makes the query a bit simpler
                 if col_filter['type'] != 'equals':
                     queries_list += [f"{col_to_query[col]}Operator={col_filter['type']}"]
+
+        elif col_filter['filterType'] == 'date':
+            # multi conditions and blank filters can't be written as a query, kept only in the grid
+            if 'conditions' in col_filter or not col_filter.get('dateFrom'):
+                continue
+            elif col_filter['type'] == 'inRange':  # range has 'dateFrom' and 'dateTo', like '2020-01-31 00:00:00'
+                queries_list += [f"{col_to_query[col]}={col_filter['dateFrom'][:10]}..{col_filter['dateTo'][:10]}"]
+            else:
+                queries_list += [f"{col_to_query[col]}={col_filter['dateFrom'][:10]}"]
+                if col_filter['type'] != 'equals':
+                    queries_list += [f"{col_to_query[col]}Operator={col_filter['type']}"]
     return '?' + '&'.join(queries_list).replace(' ', '_')
+
+
+# Grid filter/sort models evaluated on the server ###############################################################
+
+# def app wide variable that will be populated in Grids scrips with the dataframe displayed by each grid
+grid_data = {}
+# def app wide variable that will be populated in Grids scrips with the date cols of the grid dfs presorted,
+# to evaluate their date filters with a binary search instead of a full scan, see sort_grid_dates()
+grid_sorted_dates = {}
+
+
+def grid_rows_props(df):
+    # with the infinite row model, the rows are requested by the grid, see infinite_scroll_rows() in app.py
+    if GRID_ROW_MODEL == 'infinite':
+        return {'rowModelType': 'infinite'}
+    # add the df index as 'Row Id' to get back the rows of the virtualRowData in the df, see grid_rows_df()
+    return {'rowData': df.reset_index(names='Row Id').to_dict("records")}
+
+
+class FramesCache:
+    """
+    LRU cache of the frames computed from a grid filter state, shared by the callbacks of a same interaction.
+    Bounded by a number of entries and an estimated size, a value being computed only once even when several
+    callbacks ask for it concurrently.
+    """
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key: [lock, value, nbytes]
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, func):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                entry = self.entries[key] = [threading.Lock(), None, 0]
+            else:
+                self.hits += 1
+                self.entries.move_to_end(key)
+
+        # the other callbacks asking for the same key wait here for the first one to compute it
+        with entry[0]:
+            if entry[1] is None:
+                entry[1] = func()
+                entry[2] = frame_nbytes(entry[1])
+                with self.lock:
+                    if self.entries.get(key) is entry:
+                        self.nbytes += entry[2]
+                        self.evict()
+        return entry[1]
+
+    def evict(self):
+        while len(self.entries) > self.max_entries or (self.nbytes > self.max_bytes and len(self.entries) > 1):
+            _, (_, _, nbytes) = self.entries.popitem(last=False)
+            self.nbytes -= nbytes
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        return {'entries': len(self.entries), 'MB': round(self.nbytes / 2 ** 20, 2), 'hits': self.hits,
+                'misses': self.misses}
+
+
+def frame_nbytes(value):
+    # shallow size as the cached frames are taken from the grid df and share its strings
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True))
+    return 0
+
+
+frames_cache = FramesCache(FRAMES_CACHE_MAX_ENTRIES, FRAMES_CACHE_MAX_MB * 2 ** 20)
+
+
+def grid_rows_key(grid_index, grid_rows):
+    # canonical hash of the grid filter state: the filter model or the ids of the virtual rows
+    state = grid_rows if CHARTS_FROM_FILTER_MODEL else [row['Row Id'] for row in grid_rows or []]
+    state_json = json.dumps(state or None, sort_keys=True, separators=(',', ':'), default=str)
+    return grid_index, hashlib.sha256(state_json.encode()).hexdigest()
+
+
+def grid_rows_df(grid_index, grid_rows):
+    """
+    Get the rows of a grid used by the charts, from the grid prop GRID_ROWS_PROP: the filter model evaluated
+    on the server or the virtualRowData. The returned df keeps the index of the grid df, is shared through
+    frames_cache by all the callbacks of the same filter state and must not be modified.
+    """
+    def get_rows():
+        df = grid_data[grid_index]
+        if CHARTS_FROM_FILTER_MODEL:
+            return filter_df(df, grid_rows)
+        positions = df.index.get_indexer([row['Row Id'] for row in grid_rows or []])
+        # ids unknown to df (-1, that take() would map to the last row), like the rows of a browser tab kept open
+        # across a datasets update: not the rows of df, so none rather than wrong ones
+        if (positions < 0).any():
+            return df.iloc[:0]
+        return df.take(positions)
+
+    return frames_cache.get(grid_rows_key(grid_index, grid_rows) + ('rows',), get_rows)
+
+
+def grid_rows_aggregate(grid_index, grid_rows, name, func):
+    """
+    Get func(grid_rows_df()) computed once per filter state and cached under name, shared the same way as
+    grid_rows_df() so must not be modified either.
+    """
+    return frames_cache.get(grid_rows_key(grid_index, grid_rows) + (name,),
+                            lambda: func(grid_rows_df(grid_index, grid_rows)))
+
+
+def sort_grid_dates(df, col):
+    """
+    Presort the dates of a col of a grid df, like the 'YYYY-MM-DD' str of a date col, as compared by the date filters:
+    the dates without missing values in ascending order, with the positions of their rows in df.
+    To be called once df has its final order, the presorted dates being only used while df keeps the same index.
+    """
+    dates = pd.to_datetime(df[col]).dt.normalize().to_numpy()
+    positions = np.flatnonzero(~np.isnat(dates))
+    positions = positions[np.argsort(dates[positions], kind='stable')]
+    grid_sorted_dates[id(df), col] = (df.index, dates[positions], positions)
+
+
+def sorted_dates_mask(df, col, date_from, date_to, filter_type):
+    # same as scalar_filter_mask() for the dates presorted by sort_grid_dates(), None if not possible.
+    # Note: only for the filter models evaluated on the server (CHARTS_FROM_FILTER_MODEL), the virtualRowData being
+    # filtered by the grid in the browser
+    presorted = grid_sorted_dates.get((id(df), col))
+    if presorted is None or presorted[0] is not df.index or date_from is None:
+        return None
+    _, dates, positions = presorted
+
+    def search(date, side):
+        return np.searchsorted(dates, np.datetime64(date, 'ns'), side=side)
+
+    if filter_type == 'equals':
+        start, end = search(date_from, 'left'), search(date_from, 'right')
+    elif filter_type == 'greaterThan':
+        start, end = search(date_from, 'right'), len(dates)
+    elif filter_type == 'lessThan':
+        start, end = 0, search(date_from, 'left')
+    elif filter_type == 'inRange' and not pd.isna(date_to):  # bounds excluded as the grid default
+        start, end = search(date_from, 'right'), search(date_to, 'left')
+    else:
+        return None
+
+    mask = np.zeros(len(df), dtype=bool)
+    mask[positions[start:max(start, end)]] = True
+    return mask
+
+
+def text_filter_mask(values, col_filter):
+    if col_filter['type'] in ['true', 'false']:  # bool
+        return values == (col_filter['type'] == 'true')
+    if col_filter['type'] == 'blank':
+        return values.isna() | (values.astype(str).str.strip() == '')
+    if col_filter['type'] == 'notBlank':
+        return values.notna() & (values.astype(str).str.strip() != '')
+
+    # case-insensitive, as the grid default text matcher, missing values being matched as empty strings
+    if isinstance(values.dtype, pd.StringDtype):
+        # Arrow backed str, matched by the Arrow kernels on their buffers instead of one Python str per cell
+        values = values.fillna('').str.lower()
+    else:
+        values = values.fillna('').astype(str).str.lower()
+    text = str(col_filter.get('filter') or '').lower()
+    if col_filter['type'] == 'contains':
+        return values.str.contains(text, regex=False)
+    elif col_filter['type'] == 'notContains':
+        return ~values.str.contains(text, regex=False)
+    elif col_filter['type'] == 'equals':
+        return values == text
+    elif col_filter['type'] == 'notEqual':
+        return values != text
+    elif col_filter['type'] == 'startsWith':
+        return values.str.startswith(text)
+    elif col_filter['type'] == 'endsWith':
+        return values.str.endswith(text)
+    return pd.Series(True, index=values.index)
+
+
+def scalar_filter_mask(values, value_from, value_to, filter_type):
+    # shared by number and date filters, missing values only pass 'blank' as the grid default
+    if filter_type == 'blank':
+        return values.isna()
+    elif filter_type == 'notBlank':
+        return values.notna()
+    elif value_from is None:  # incomplete condition, like an empty floating filter
+        return pd.Series(True, index=values.index)
+    elif filter_type == 'equals':
+        return values == value_from
+    elif filter_type == 'notEqual':
+        return values.notna() & (values != value_from)
+    elif filter_type == 'greaterThan':
+        return values > value_from
+    elif filter_type == 'greaterThanOrEqual':
+        return values >= value_from
+    elif filter_type == 'lessThan':
+        return values < value_from
+    elif filter_type == 'lessThanOrEqual':
+        return values <= value_from
+    elif filter_type == 'inRange':  # bounds excluded as the grid default
+        return (values > value_from) & (values < value_to)
+    return pd.Series(True, index=values.index)
+
+
+def filter_mask(df, col, col_filter):
+    # multi conditions
+    if 'conditions' in col_filter:
+        masks = [filter_mask(df, col, condition) for condition in col_filter['conditions']]
+        if col_filter.get('operator') == 'AND':
+            return np.logical_and.reduce(masks)
+        return np.logical_or.reduce(masks)
+
+    if col_filter['filterType'] == 'text':
+        return text_filter_mask(df[col], col_filter)
+    elif col_filter['filterType'] == 'number':
+        return scalar_filter_mask(
+            df[col], col_filter.get('filter'), col_filter.get('filterTo'), col_filter['type'])
+    elif col_filter['filterType'] == 'date':
+        # grid dates are like '2020-01-31 00:00:00', compared with the date of the col values
+        date_from = pd.to_datetime(col_filter.get('dateFrom'))
+        date_from = None if pd.isna(date_from) else date_from
+        date_to = pd.to_datetime(col_filter.get('dateTo'))
+        mask = sorted_dates_mask(df, col, date_from, date_to, col_filter['type'])
+        if mask is not None:
+            return mask
+        return scalar_filter_mask(pd.to_datetime(df[col]).dt.normalize(), date_from, date_to, col_filter['type'])
+    return pd.Series(True, index=df.index)
+
+
+def filter_df(df, filter_model):
+    """Apply a grid filter model to the dataframe, keeping its index"""
+    if not filter_model:
+        return df
+
+    mask = np.ones(len(df), dtype=bool)
+    for col, col_filter in filter_model.items():
+        # skip the filters of unknown cols
+        if col in df.columns:
+            mask &= np.asarray(filter_mask(df, col, col_filter), dtype=bool)
+    # Note: take() doesn't flag the result as a copy of df, unlike df[mask]
+    return df.take(np.flatnonzero(mask))
+
+
+def sort_df(df, sort_model):
+    """Apply a grid sort model to the dataframe, missing values first in ascending order as the grid default"""
+    sort_model = [s for s in sort_model or [] if s['colId'] in df.columns]
+    if not sort_model:
+        return df
+
+    return df.sort_values(
+        by=[s['colId'] for s in sort_model], ascending=[s['sort'] == 'asc' for s in sort_model],
+        kind='stable', na_position='first' if sort_model[0]['sort'] == 'asc' else 'last'
+    )
+
+
+# Rendered dashboards ###############################################################################################
+
+# the children of each dashboard by (page, theme), as the parsed JSON tree sent to the browser
+rendered_dashboards = {}
+render_lock = threading.Lock()
+# def app wide variable that will be populated in Dashboards scripts with the render function of each page
+dashboards_children = {}
+
+
+def rendered_children(page, theme, render):
+    """
+    Get the children of a dashboard render(theme), rendered once by page and theme, so switching dashboards doesn't
+    rebuild the components, rowData and figures. Only the build is cached: Dash only takes python values as callback
+    outputs, so the cached tree of plain dicts and lists is still dumped by Dash at each request, though in one pass
+    without the plotly objects encoding. The datasets being loaded once by process, they are not part of the key.
+    The renders are done one at a time, so a page is only rendered once even with concurrent first requests.
+    """
+    key = (page, theme)
+    children = rendered_dashboards.get(key)
+    if children is None:
+        with render_lock:
+            children = rendered_dashboards.get(key)
+            if children is None:
+                children = rendered_dashboards[key] = json.loads(to_json_plotly(render(theme)))
+    return children
+
+
+def prerender_dashboards():
+    """Render all the dashboards in both themes, e.g. in the master process before forking the workers"""
+    for page, render in dashboards_children.items():
+        for theme in ('light', 'dark'):
+            rendered_children(page, theme, render)
+
+
+if __name__ == '__main__':
+    # build step: (re)write the prepared datasets cache, e.g. before starting the workers. A missing cache has just
+    # been written by the import, only an existing one is rebuilt
+    if datasets_cache_existed:
+        shutil.rmtree(datasets_cache_path(DATASETS_HASH), ignore_errors=True)
+        save_datasets_cache(prepare_datasets(assets_folder), datasets_cache_path(DATASETS_HASH))
@@ -0,0 +1,18 @@
+window.dash_clientside = window.dash_clientside || {};
+
+window.dash_clientside.grids = {
+    // sum the columns of the rows displayed by a grid to patch its pinned bottom TOTAL row, similar to the python
+    // row_pinning_bottom() used with the infinite row model
+    pinnedTotalRow: (virtualRowData, labelCol, cols) => {
+        if (!virtualRowData || !virtualRowData.length) {
+            return window.dash_clientside.no_update;
+        }
+
+        const totalRow = {[labelCol]: 'TOTAL'};
+        cols.forEach((col) => {
+            totalRow[col] = virtualRowData.reduce((total, row) => total + (Number(row[col]) || 0), 0);
+        });
+
+        return new window.dash_clientside.Patch().assign(['pinnedBottomRowData'], [totalRow]).build();
+    }
+}
@@ -0,0 +1,253 @@
+"""
+Benchmark of the dashboards callbacks, driven without a browser.
+
+The registered server callbacks fed by the rows of the main grids (virtualRowData, or filterModel with
+CHARTS_FROM_FILTER_MODEL) are called directly with the grid rows built from the app_config frames, with and without
+representative filters, the other inputs being the initial values of the dashboards layouts. For each callback and
+scenario it reports p50/p95 latency, the peak memory allocated by the call, the size of the grid rows sent by the
+browser and of the returned payload. The import time of app_config and of each pages.*.components package is
+measured in fresh interpreters.
+
+Run from the project root, the results being written as JSON to compare runs:
+    python benchmarks/bench_callbacks.py --repeat 20 --output benchmarks/results/my_run.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+
+COMPONENTS_PACKAGES = ['pages.country.components', 'pages.readiness.components', 'pages.FA.components',
+                       'pages.entities.components']
+
+# representative filters of each dashboard grid, 'full' being the whole dataset
+SCENARIOS = {
+    'countries': {
+        'full': None,
+        'region': {'Region': {'filterType': 'text', 'type': 'contains', 'filter': 'africa'}},
+        'SIDS': {'SIDS': {'filterType': 'text', 'type': 'true'}},
+        'RP financing': {'RP Financing $': {'filterType': 'number', 'type': 'greaterThan', 'filter': 1000000}},
+    },
+    'readiness': {
+        'full': None,
+        'status': {'Status': {'filterType': 'text', 'type': 'contains', 'filter': 'disbursed'}},
+        'NAP': {'NAP': {'filterType': 'text', 'type': 'true'}},
+        'country': {'Country': {'filterType': 'text', 'type': 'contains', 'filter': 'a'}},
+    },
+    'fa': {
+        'full': None,
+        'financing': {'FA Financing': {'filterType': 'number', 'type': 'greaterThan', 'filter': 50000000}},
+        'theme': {'Theme': {'filterType': 'text', 'type': 'equals', 'filter': 'Mitigation'}},
+        'multi country': {'Multi Country': {'filterType': 'text', 'type': 'true'}},
+    },
+    'entities': {
+        'full': None,
+        'type': {'Type': {'filterType': 'text', 'type': 'contains', 'filter': 'national'}},
+        'DAE': {'DAE': {'filterType': 'text', 'type': 'true'}},
+        'approved': {'# Approved': {'filterType': 'number', 'type': 'greaterThanOrEqual', 'filter': 2}},
+    },
+}
+
+
+def measure_imports():
+    # each module in a fresh interpreter, the components packages being timed after app_config
+    script = (
+        "import sys, time, json\n"
+        "t0 = time.perf_counter()\n"
+        "import app_config\n"
+        "t1 = time.perf_counter()\n"
+        "if sys.argv[1] != 'app_config':\n"
+        "    __import__(sys.argv[1])\n"
+        "t2 = time.perf_counter()\n"
+        "print(json.dumps({'app_config': t1 - t0, 'module': t2 - t1}))\n"
+    )
+    imports = {}
+    for module in ['app_config'] + COMPONENTS_PACKAGES:
+        res = subprocess.run([sys.executable, '-c', script, module], cwd=ROOT, capture_output=True, text=True)
+        if res.returncode:
+            imports[module] = {'error': res.stderr.strip().splitlines()[-1]}
+            continue
+        times = json.loads(res.stdout.strip().splitlines()[-1])
+        imports[module] = {'seconds': round(times['app_config' if module == 'app_config' else 'module'], 4)}
+    return imports
+
+
+def layout_values():
+    # initial props of the components of every dashboard, by stringified id, as sent by the browser
+    from dash._callback import GLOBAL_CALLBACK_MAP
+    from dash._utils import stringify_id, to_json
+
+    values = {}
+
+    def walk(node):
+        if isinstance(node, dict):
+            if 'props' in node and 'type' in node:
+                if 'id' in node['props']:
+                    values[stringify_id(node['props']['id'])] = node['props']
+            for child in node.values():
+                walk(child)
+        elif isinstance(node, list):
+            for child in node:
+                walk(child)
+
+    for key, callback in GLOBAL_CALLBACK_MAP.items():
+        if key.endswith('-container.children'):
+            walk(json.loads(to_json(callback['callback'].__wrapped__(None, True))))
+    return values
+
+
+def grid_rows_value(grid_index, filter_model):
+    from app_config import CHARTS_FROM_FILTER_MODEL, grid_data, filter_df
+
+    if CHARTS_FROM_FILTER_MODEL:
+        return filter_model
+    return filter_df(grid_data[grid_index], filter_model).reset_index(names='Row Id').to_dict('records')
+
+
+def grid_callbacks():
+    # server callbacks with the rows of a main grid as input, with the index of the grid
+    from dash._callback import GLOBAL_CALLBACK_MAP
+    from app_config import GRID_ROWS_PROP, grid_data
+
+    for key, callback in GLOBAL_CALLBACK_MAP.items():
+        if 'callback' not in callback:  # clientside
+            continue
+        for item in callback['inputs']:
+            item_id = json.loads(item['id']) if item['id'].startswith('{') else item['id']
+            if isinstance(item_id, dict) and item_id.get('type') == 'grid' and item['property'] == GRID_ROWS_PROP \
+                    and str(item_id.get('index')) in grid_data:
+                yield key, callback, item_id['index'], item
+                break
+
+
+def run_callback(func, args, triggered):
+    from dash._callback_context import context_value
+    from dash._utils import AttributeDict
+
+    context_value.set(AttributeDict(triggered_inputs=[triggered], updated_props={}))
+    return func(*args)
+
+
+def measure_callbacks(values, repeat, keep_cache):
+    from dash._utils import to_json
+    from app_config import frames_cache
+
+    results = []
+    for key, callback, grid_index, grid_input in grid_callbacks():
+        func = callback['callback'].__wrapped__
+        for scenario, filter_model in SCENARIOS[grid_index].items():
+            grid_rows = grid_rows_value(grid_index, filter_model)
+
+            def value(item):
+                if item is grid_input:
+                    return grid_rows
+                props = values.get(item['id'], {})
+                # the grid of the treemap levels is not a main grid, its rows are its rowData
+                return props.get('rowData') if item['property'] == 'virtualRowData' else props.get(item['property'])
+
+            args = [value(item) for item in callback['inputs'] + callback['state']]
+            triggered = {'prop_id': f"{grid_input['id']}.{grid_input['property']}", 'value': grid_rows}
+
+            timings = []
+            for _ in range(repeat):
+                if not keep_cache:
+                    frames_cache.clear()
+                t0 = time.perf_counter()
+                output = run_callback(func, args, triggered)
+                timings.append(time.perf_counter() - t0)
+
+            if not keep_cache:
+                frames_cache.clear()
+            tracemalloc.start()
+            run_callback(func, args, triggered)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            results.append({
+                'dashboard': grid_index,
+                'callback': f"{func.__module__}.{func.__name__}",
+                'output': key.split('@')[0],
+                'scenario': scenario,
+                'rows': len(grid_rows) if isinstance(grid_rows, list) else None,
+                'p50_ms': round(float(np.percentile(timings, 50)) * 1000, 3),
+                'p95_ms': round(float(np.percentile(timings, 95)) * 1000, 3),
+                'peak_kib': round(peak / 1024, 1),
+                'request_bytes': len(to_json(grid_rows)),
+                'payload_bytes': len(to_json(output)),
+            })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark of the dashboards callbacks without a browser.')
+    parser.add_argument('--repeat', type=int, default=10, help='number of timed calls per callback and scenario')
+    parser.add_argument('--keep-cache', action='store_true',
+                        help='keep the frames cache between calls instead of measuring cold interactions')
+    parser.add_argument('--no-imports', action='store_true', help='skip the import times')
+    parser.add_argument('--output', help='JSON results file, default benchmarks/results/<date>.json')
+    parser.add_argument('--baseline', help='JSON results file of a previous run to compare the p50 latencies with')
+    args = parser.parse_args()
+
+    imports = {} if args.no_imports else measure_imports()
+
+    import app  # noqa: F401, registers the pages and their callbacks
+    import app_config
+
+    results = measure_callbacks(layout_values(), args.repeat, args.keep_cache)
+
+    report = {
+        'meta': {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'commit': subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                     text=True).stdout.strip(),
+            'datasets_hash': app_config.DATASETS_HASH,
+            'grid_row_model': app_config.GRID_ROW_MODEL,
+            'grid_rows_prop': app_config.GRID_ROWS_PROP,
+            'repeat': args.repeat,
+            'keep_cache': args.keep_cache,
+        },
+        'imports': imports,
+        'callbacks': results,
+    }
+
+    output = args.output or f"{ROOT}/benchmarks/results/{datetime.now():%Y%m%d-%H%M%S}.json"
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for module, res in imports.items():
+        print(f"import {module:<30} {res.get('seconds', res.get('error'))}")
+    print(f"\n{'callback':<60} {'scenario':<15} {'rows':>6} {'p50 ms':>9} {'p95 ms':>9} {'peak KiB':>9} "
+          f"{'request B':>10} {'payload B':>10}")
+    for res in results:
+        rows = '' if res['rows'] is None else res['rows']
+        print(f"{res['callback'].split('.', 2)[-1]:<60} {res['scenario']:<15} {rows:>6} "
+              f"{res['p50_ms']:>9} {res['p95_ms']:>9} {res['peak_kib']:>9} {res['request_bytes']:>10} "
+              f"{res['payload_bytes']:>10}")
+    print(f"\nresults written to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {(res['output'], res['scenario']): res for res in json.load(f)['callbacks']}
+        print(f"\n{'callback':<60} {'scenario':<15} {'base p50':>9} {'p50 ms':>9} {'ratio':>6}")
+        for res in results:
+            base = baseline.get((res['output'], res['scenario']))
+            if base:
+                print(f"{res['callback'].split('.', 2)[-1]:<60} {res['scenario']:<15} {base['p50_ms']:>9} "
+                      f"{res['p50_ms']:>9} {res['p50_ms'] / base['p50_ms']:>6.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""
+Generate scaled versions of the GCF datasets of the assets folder, to test the app at scale.
+
+Every original row is cloned scale times: the clone k of a country/entity gets a suffixed name (the entity code
+becoming 'code_k', the country ISO3 code 'ISO3_k') but keeps its region, flags and entity country, and the clone k of a
+readiness/FA project is attached to the clones k of its countries and entity. So the distributions of the categories,
+of the board meetings numbering and of the number of countries by project stay the ones of the originals, the dates and
+amounts being jittered around the original values. The aggregated columns of the countries and entities are recomputed
+from the generated projects.
+Note: the cloned countries don't resolve on the choropleth maps. Their 'ISO3_k' codes are not real ISO3 codes, as there
+are not enough of those for the clones, so the maps get the data of all the countries but only draw the originals.
+
+The folders can be used by the app and the benchmarks with the GCF_DATA_FOLDER env variable:
+    python benchmarks/generate_data.py --scale 10 100 1000
+    GCF_DATA_FOLDER=benchmarks/data/x100 python benchmarks/bench_callbacks.py
+"""
+import argparse
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE_FOLDER = os.path.join(ROOT, 'assets')
+
+
+def tile(df, scale):
+    # the originals repeated scale times, with the clone number in the 'k' col
+    return pd.concat([df.assign(k=k) for k in range(scale)], ignore_index=True)
+
+
+def clone_list(values, clones, sep):
+    # the separated lists of the clone k: unchanged for the originals (k=0), else each item suffixed with ' k'
+    items = values.str.split(sep).explode().str.strip()
+    k = clones.reindex(items.index)
+    items = items.where(k == 0, items + ' ' + k.astype(str))
+    return items.groupby(level=0).agg(', '.join).reindex(values.index)
+
+
+def jitter(values, rng, sigma):
+    return values * rng.lognormal(0, sigma, len(values))
+
+
+def generate(scale, output_folder, seed=0):
+    rng = np.random.default_rng(seed)
+
+    countries = pd.read_csv(f'{SOURCE_FOLDER}/GCF-countries.csv')
+    entities = pd.read_csv(f'{SOURCE_FOLDER}/GCF-entities.csv')
+    readiness = pd.read_csv(f'{SOURCE_FOLDER}/GCF-readiness.csv')
+    fa = pd.read_csv(f'{SOURCE_FOLDER}/GCF-FA.csv')
+
+    # Entities #####################################################################################
+    known_entities = set(entities['Entity'].str.replace('_', ' '))
+    entities = tile(entities, scale)
+    clones = entities['k'].astype(str)
+    entities['Entity'] = entities['Entity'].where(entities['k'] == 0, entities['Entity'] + '_' + clones)
+    entities['Name'] = entities['Name'].where(entities['k'] == 0, entities['Name'] + ' (' + clones + ')')
+
+    def entity_clone(codes, k):
+        # clone k of the entities, entities missing from the entities file replaced by a random one
+        codes = codes.str.replace('_', ' ')
+        missing = ~codes.isin(known_entities)
+        codes = codes.where(~missing, rng.choice(sorted(known_entities), len(codes)))
+        return codes.where(k == 0, codes + '_' + k.astype(str))
+
+    # Readiness #####################################################################################
+    readiness = tile(readiness, scale)
+    clones = readiness['k'].astype(str)
+    # the multi countries and missing countries are kept
+    single_country = readiness['Country'].isin(countries['Country Name'])
+    readiness['Country'] = readiness['Country'].where(~single_country | (readiness['k'] == 0),
+                                                      readiness['Country'] + ' ' + clones)
+    readiness['Ref #'] = readiness['Ref #'].where(readiness['k'] == 0, readiness['Ref #'] + '-' + clones)
+    readiness['Delivery Partner'] = entity_clone(readiness['Delivery Partner'].fillna(''), readiness['k'])
+
+    dates = pd.to_datetime(readiness['Approved Date'], format='%b %d, %Y')
+    jittered = dates + pd.to_timedelta(rng.integers(-180, 181, len(dates)), unit='D')
+    jittered = jittered.where(readiness['k'] > 0, dates).clip(dates.min(), dates.max())
+    readiness['Approved Date'] = jittered.dt.strftime('%b %d, %Y').str.replace(' 0', ' ')
+    readiness['Financing'] = jitter(readiness['Financing'], rng, 0.1).where(
+        readiness['k'] > 0, readiness['Financing']).round()
+
+    # Funded Activities #####################################################################################
+    fa = tile(fa, scale)
+    clones = fa['k'].astype(str)
+    fa['Ref #'] = fa['Ref #'].where(fa['k'] == 0, fa['Ref #'] + '-' + clones)
+    fa['Project Name'] = fa['Project Name'].where(fa['k'] == 0, fa['Project Name'] + ' (' + clones + ')')
+    fa['Entity'] = entity_clone(fa['Entity'], fa['k'])
+    fa['Countries'] = clone_list(fa['Countries'], fa['k'], ',')
+    fa['FA Financing'] = jitter(fa['FA Financing'], rng, 0.1).where(fa['k'] > 0, fa['FA Financing']).round()
+
+    # Countries #####################################################################################
+    countries = tile(countries, scale)
+    countries['Country Name'] = countries['Country Name'].where(
+        countries['k'] == 0, countries['Country Name'] + ' ' + countries['k'].astype(str))
+    # distinct ISO3 codes, the map and its data being keyed by them
+    countries['ISO3'] = countries['ISO3'].where(
+        countries['k'] == 0, countries['ISO3'] + '_' + countries['k'].astype(str))
+
+    rp = readiness[readiness['Country'].isin(countries['Country Name'])].groupby('Country')['Financing']
+    fa_countries = fa.assign(Country=fa['Countries'].str.split(',')).explode('Country')
+    fa_countries['Country'] = fa_countries['Country'].str.strip()
+    # the financing of multi countries projects shared equally
+    fa_countries['FA Financing'] /= fa_countries.groupby(level=0)['Country'].transform('size')
+    fa_by_country = fa_countries.groupby('Country')['FA Financing']
+
+    countries['# RP'] = countries['Country Name'].map(rp.size()).fillna(0).astype(int)
+    countries['RP Financing $'] = countries['Country Name'].map(rp.sum())
+    countries['# FA'] = countries['Country Name'].map(fa_by_country.size()).fillna(0).astype(int)
+    countries['FA Financing $'] = countries['Country Name'].map(fa_by_country.sum()).round(1)
+
+    fa_by_entity = fa.assign(Entity=fa['Entity'].str.replace('_', ' ')).groupby('Entity')['FA Financing']
+    entity_codes = entities['Entity'].str.replace('_', ' ')
+    entities['# Approved'] = entity_codes.map(fa_by_entity.size()).fillna(0).astype(int)
+    entities['FA Financing'] = entity_codes.map(fa_by_entity.sum()).fillna(0)
+
+    # Write #####################################################################################
+    os.makedirs(output_folder, exist_ok=True)
+    for df, name, encoding in [(countries, 'GCF-countries.csv', 'utf-8-sig'), (entities, 'GCF-entities.csv', 'utf-8'),
+                               (readiness, 'GCF-readiness.csv', 'utf-8'), (fa, 'GCF-FA.csv', 'utf-8')]:
+        df = df.drop(columns='k')
+        # same booleans as the originals
+        for col in df.select_dtypes(bool).columns:
+            df[col] = df[col].map({True: 'TRUE', False: 'FALSE'})
+        df.to_csv(f'{output_folder}/{name}', index=False, encoding=encoding)
+    shutil.copy(f'{SOURCE_FOLDER}/countries_codes_and_coordinates.csv', output_folder)
+
+    return {'countries': len(countries), 'entities': len(entities), 'readiness': len(readiness), 'FA': len(fa)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate scaled versions of the GCF datasets.')
+    parser.add_argument('--scale', type=int, nargs='+', default=[10, 100, 1000], help='scale factors')
+    parser.add_argument('--output', default=os.path.join(ROOT, 'benchmarks', 'data'),
+                        help='parent folder of the x<scale> datasets folders')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    for scale in args.scale:
+        output_folder = os.path.join(args.output, f'x{scale}')
+        print(f'x{scale}:', generate(scale, output_folder, args.seed), '->', output_folder)
+
+
+if __name__ == '__main__':
+    main()
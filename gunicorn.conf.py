@@ -0,0 +1,45 @@
+# Gunicorn settings of the preloaded mode, read by default when gunicorn is started from this folder:
+#     gunicorn
+# the master process imports the app once: datasets loaded, module level figures built and dashboards rendered,
+# then forks the workers which share these pages copy-on-write instead of building their own copies.
+# Any setting can still be overridden on the command line, e.g. `gunicorn -w 8 -b 127.0.0.1:8000`.
+# Note: also read by `gunicorn app:server` started from this folder, which then runs in this mode (see README.md)
+import gc
+import os
+
+# the pre-fork pattern of the gc.freeze() doc: no garbage collection in the master, whose objects are frozen just
+# before each fork (pre_fork) then collected again in the workers only (post_fork). A collection in the master would
+# free objects and leave holes in the pages shared with the workers, later filled by their own allocations.
+# Note: this file is read by the master before it imports the app
+gc.disable()
+
+# Opt-in env variables of app_config, both off by default:
+# - ARROW_STRINGS=true keeps the str columns in Arrow buffers, whose cells are not Python objects with refcounts
+#   written by the workers, which would copy the shared pages
+# - DATASETS_MMAP=true memory-maps the prepared datasets, with Arrow backed str columns, so they are also shared
+#   with the other servers of the host
+
+wsgi_app = 'app:server'
+bind = f"0.0.0.0:{os.getenv('PORT', 8050)}"
+workers = int(os.getenv('WEB_CONCURRENCY', 4))
+threads = int(os.getenv('GUNICORN_THREADS', 1))
+# import the app in the master before forking the workers
+preload_app = True
+
+
+def when_ready(server):
+    # runs in the master, after the app import and before the workers are forked
+    from app_config import prerender_dashboards
+
+    # the dashboards JSON rendered once, instead of at the first request of each page by each worker
+    prerender_dashboards()
+
+
+def pre_fork(server, worker):
+    # move all the objects of the master to the permanent generation, so the garbage collections of the workers
+    # don't write in their headers and copy the shared pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    gc.enable()
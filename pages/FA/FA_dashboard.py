@@ -9,7 +9,7 @@ from dash_iconify import DashIconify
 import pandas as pd
 from dash import Dash, html, Input, Output, register_page, clientside_callback, dcc, callback, State
 import pages.FA.components as components
-from app_config import text_carousel
+from app_config import text_carousel, rendered_children, dashboards_children
 
 register_page(__name__, path="/funded-activities", title="Funded Activities",
               description="The Funded Activities dashboard shows the approved projects "
@@ -19,15 +19,7 @@ register_page(__name__, path="/funded-activities", title="Funded Activities",
 layout = dmc.Stack(id='fa-container', w='100%', style={"flex": 1}, align='center')
 
 
-# we use a callback to render the children to be able to provide the theme before they render
-# to avoid flickering at init and when switching dashboard
-@callback(
-    Output('fa-container', "children"),
-    Input('fa-container', "id"),
-    State("color-scheme-switch", "checked"),
-)
-def render_children(_, checked):
-    theme = 'light' if checked else 'dark'
+def fa_children(theme):
     return [
         dmc.Group([
 
@@ -117,3 +109,18 @@ def render_children(_, checked):
         components.fa_grid(theme)
 
     ]
+
+
+dashboards_children['fa'] = fa_children
+
+
+# we use a callback to render the children to be able to provide the theme before they render
+# to avoid flickering at init and when switching dashboard
+@callback(
+    Output('fa-container', "children"),
+    Input('fa-container', "id"),
+    State("color-scheme-switch", "checked"),
+)
+def render_children(_, checked):
+    theme = 'light' if checked else 'dark'
+    return rendered_children('fa', theme, fa_children)
@@ -12,7 +12,8 @@ from plotly.subplots import make_subplots
 
 import pandas as pd
 
-from app_config import df_FA, format_money_number_si, SECONDARY_COLOR
+from app_config import df_FA, format_money_number_si, format_money_numbers_si, SECONDARY_COLOR, grid_rows_df, \
+    grid_rows_aggregate, GRID_ROWS_PROP, themed_figure
 
 cat_cols = {
     'Theme': {'Adaptation': '#15a14a', 'Cross-cutting': '#158575', 'Mitigation': '#1569a1'},
@@ -41,41 +42,66 @@ def cat_hover(col, cat):
         return f"{col}: {cat}"
 
 
+# (col, cat) of each bar trace, in the order of the fig traces
+bar_traces = [(col, cat) for col in cat_cols for cat in cat_cols[col]]
+
+
+def bar_trace_codes(df):
+    # trace number of the cat of each row, for each cat col (rows x cols), -1 for a cat without bar
+    codes = pd.DataFrame(-1, index=df.index, columns=list(cat_cols))
+    for col in cat_cols:
+        # rename bool as Yes/No
+        values = df[col].map({True: 'Yes', False: 'No'}) if col in ['Priority States', 'Multi Country'] else df[col]
+        traces = {cat: i for i, (trace_col, cat) in enumerate(bar_traces) if trace_col == col}
+        codes[col] = values.map(traces).fillna(-1).astype(np.int64)
+    return codes
+
+
+# Note: matched by index with the rows, which come in the order of the grid sort rather than the one of df_FA
+fa_trace_codes = bar_trace_codes(df_FA)
+
+
+def bar_data(df):
+    # sum financing and nb of projects of every bar at once, from the flattened (row, col) trace codes of the df rows
+    codes = fa_trace_codes.to_numpy()[fa_trace_codes.index.get_indexer(df.index)]
+    financing = np.broadcast_to(df['FA Financing'].fillna(0).to_numpy()[:, None], codes.shape)
+    kept = codes >= 0
+    dff = pd.DataFrame({
+        'FA Financing': np.bincount(codes[kept], weights=financing[kept], minlength=len(bar_traces)),
+        'Number': np.bincount(codes[kept], minlength=len(bar_traces)),
+    })
+    # use custom function to have $1B instead of $1G, as it is not possible with D3-formatting
+    dff['Financing $'] = format_money_numbers_si(dff['FA Financing'])
+    return dff
+
+
+dff = bar_data(df_FA)
+
 fig = go.Figure()
-for col in cat_cols:
-    dff = pd.DataFrame(df_FA.groupby(col)['FA Financing'].sum())
-    dff['Number'] = df_FA[col].value_counts()
-
-    # rename bool as Yes/No
-    if col in ['Priority States', 'Multi Country']:
-        dff = dff.rename({True: 'Yes', False: 'No'})
-
-    for cat in cat_cols[col]:
-        fig.add_bar(
-            orientation='h',
-            name=cat,
-            x=[dff['FA Financing'][cat]],
-            y=[col],
-            textfont_color='var(--mantine-color-text)',
-            textposition="inside", insidetextanchor="middle", textangle=0,
-            # customdata: 0=cat, 1=financing, 2=number, 3=financing %, 4=cat_hover
-            customdata=[(cat,
-                         # use custom function to have $1B instead of $1G, as it is not possible with D3-formatting
-                         format_money_number_si(dff['FA Financing'][cat]), dff['Number'][cat],
-                         dff['FA Financing'][cat] / total_financing_sum, cat_hover(col, cat))],
-            texttemplate="<b>%{customdata[0]} %{customdata[3]:.0%}</b><br>"
-                         "%{customdata[1]} (%{customdata[2]})<br>",
-            hovertemplate="<b>%{customdata[4]}</b><br>"
-                          "%{customdata[3]:.0%} of Total<br>"
-                          "%{customdata[1]} (%{customdata[2]})<extra></extra>",
-            marker=dict(
-                color=cat_cols[col][cat],
-                line={'color': cat_cols[col][cat], 'width': 2},
-                # Trick to add transparency to the color marker only, not the border, as marker_opacity applies to both
-                pattern={'fillmode': "replace", 'shape': "/", 'solidity': 1,
-                         'fgcolor': cat_cols[col][cat], 'fgopacity': 0.5}
-            ),
-        )
+for i, (col, cat) in enumerate(bar_traces):
+    fig.add_bar(
+        orientation='h',
+        name=cat,
+        x=[dff['FA Financing'][i]],
+        y=[col],
+        textfont_color='var(--mantine-color-text)',
+        textposition="inside", insidetextanchor="middle", textangle=0,
+        # customdata: 0=cat, 1=financing, 2=number, 3=financing %, 4=cat_hover
+        customdata=[(cat, dff['Financing $'][i], dff['Number'][i],
+                     dff['FA Financing'][i] / total_financing_sum, cat_hover(col, cat))],
+        texttemplate="<b>%{customdata[0]} %{customdata[3]:.0%}</b><br>"
+                     "%{customdata[1]} (%{customdata[2]})<br>",
+        hovertemplate="<b>%{customdata[4]}</b><br>"
+                      "%{customdata[3]:.0%} of Total<br>"
+                      "%{customdata[1]} (%{customdata[2]})<extra></extra>",
+        marker=dict(
+            color=cat_cols[col][cat],
+            line={'color': cat_cols[col][cat], 'width': 2},
+            # Trick to add transparency to the color marker only, not the border, as marker_opacity applies to both
+            pattern={'fillmode': "replace", 'shape': "/", 'solidity': 1,
+                     'fgcolor': cat_cols[col][cat], 'fgopacity': 0.5}
+        ),
+    )
 
 # add zero and total lines
 fig.add_vline(x=0, line={'color': 'var(--mantine-color-text)', 'width': 5})
@@ -104,13 +130,15 @@ fig.update_layout(
     showlegend=False,
 )
 
+# plotly JSON of the figure, shared by the renders that overlay their theme on it
+base_fig = fig.to_plotly_json()
+
 
 def fa_bar(theme='light'):
-    fig.update_layout(template=pio.templates[f"mantine_{theme}"])
     return dcc.Graph(
         id={'type': 'figure', 'subtype': 'bar', 'index': 'fa'},
         config={'displayModeBar': False}, responsive=True,
-        figure=fig,
+        figure=themed_figure(base_fig, theme),
         style={"flex": 1, "padding": 10},
     )
 
@@ -118,53 +146,40 @@ def fa_bar(theme='light'):
 @callback(
     Output({'type': 'figure', 'subtype': 'bar', 'index': 'fa'}, "figure", allow_duplicate=True),
     Input("fa-bar-carousel", "active"),
-    Input({'type': 'grid', 'index': 'fa'}, "virtualRowData"),
-    State({'type': 'figure', 'subtype': 'bar', 'index': 'fa'}, "figure"),
+    Input({'type': 'grid', 'index': 'fa'}, GRID_ROWS_PROP),
     prevent_initial_call=True
 )
-def update_fa_bar_data(carousel, virtual_data, fig):
+def update_fa_bar_data(carousel, grid_rows):
     patched_fig = Patch()
-    if not virtual_data:
-        for i, trace in enumerate(fig['data']):
+    dff_grid = grid_rows_df('fa', grid_rows)
+    if dff_grid.empty:
+        for i in range(len(bar_traces)):
             patched_fig["data"][i]['x'] = None
             patched_fig["layout"]['shapes'][1] = {"x0": 0, "x1": 0}
             patched_fig["layout"]['annotations'][0] = {"x": 0, "text": 0}
             patched_fig["layout"]['xaxis']['range'] = None
         return patched_fig
 
-    dff_grid = pd.DataFrame(virtual_data)
-
     total_financing_sum = dff_grid['FA Financing'].sum()
     total_number_sum = len(dff_grid)
 
-    # precompute dff for each col to not calculate the same dff for each cat of the same col
-    dff_cols = {}
-    for col in cat_cols:
-        dff_cols[col] = pd.DataFrame(dff_grid.groupby(col)['FA Financing'].sum())
-        dff_cols[col]['Number'] = dff_grid[col].value_counts()
-        if col in ['Priority States', 'Multi Country']:
-            dff_cols[col] = dff_cols[col].rename({True: 'Yes', False: 'No'})
-
-    for i, trace in enumerate(fig['data']):
-        col = trace['y'][0]
-        cat = trace['name']
-
-        dff = dff_cols[col]
+    # sums and numbers of all the bars at once, shared by the carousel switches of the same grid rows
+    dff = grid_rows_aggregate('fa', grid_rows, 'bar', bar_data)
 
-        if cat not in dff.index:
+    for i, (col, cat) in enumerate(bar_traces):
+        if not dff['Number'][i]:
             # set x=0 for the cat will hide the bar so no need to update customdata, texttemplate, hovertemplate
             patched_fig["data"][i]['x'] = [0]
         else:
 
             # carousel 0=Financing, 1=Number
             if carousel:
-                x = [dff['Number'][cat]]
+                x = [dff['Number'][i]]
                 # customdata: 0=cat, 1=financing, 2=number, 3=financing %, 4=cat_hover
                 customdata = [(
                     cat,
-                    # use custom function to have $1B instead of $1G, as it is not possible with D3-formatting
-                    format_money_number_si(dff['FA Financing'][cat]), dff['Number'][cat],
-                    dff['Number'][cat] / total_number_sum, cat_hover(col, cat)
+                    dff['Financing $'][i], dff['Number'][i],
+                    dff['Number'][i] / total_number_sum, cat_hover(col, cat)
                 )]
                 texttemplate = ("<b>%{customdata[0]} %{customdata[3]:.0%}</b><br>"
                                 "%{customdata[2]} (%{customdata[1]})<br>")
@@ -172,13 +187,12 @@ def update_fa_bar_data(carousel, virtual_data, fig):
                                  "%{customdata[3]:.0%} of Total<br>"
                                  "%{customdata[2]} (%{customdata[1]})<extra></extra>")
             else:
-                x = [dff['FA Financing'][cat]]
+                x = [dff['FA Financing'][i]]
                 # customdata: 0=cat, 1=financing, 2=number, 3=financing %, 4=cat_hover
                 customdata = [(
                     cat,
-                    # use custom function to have $1B instead of $1G, as it is not possible with D3-formatting
-                    format_money_number_si(dff['FA Financing'][cat]), dff['Number'][cat],
-                    dff['FA Financing'][cat] / total_financing_sum, cat_hover(col, cat)
+                    dff['Financing $'][i], dff['Number'][i],
+                    dff['FA Financing'][i] / total_financing_sum, cat_hover(col, cat)
                 )]
                 texttemplate = ("<b>%{customdata[0]} %{customdata[3]:.0%}</b><br>"
                                 "%{customdata[1]} (%{customdata[2]})<br>")
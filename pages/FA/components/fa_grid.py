@@ -8,10 +8,8 @@ import dash_ag_grid as dag
 import dash_mantine_components as dmc
 from dash_iconify import DashIconify
 
-from app_config import df_FA, header_template_with_icon, query_to_col, col_to_query
-
-# sort by ref for the default order in the grid
-df_FA.sort_values('Ref #', inplace=True, na_position='last')
+from app_config import df_FA, header_template_with_icon, query_to_col, col_to_query, \
+    grid_data, grid_rows_props
 
 financing_header_tooltip = '''
   The amount of GCF funding allocated to each country  
@@ -79,7 +77,7 @@ def fa_grid(theme='light'):
     return html.Div([
         dag.AgGrid(
             id={'type': 'grid', 'index': 'fa'},
-            rowData=df_FA.to_dict("records"),
+            **grid_rows_props(df_FA),
             columnDefs=columnDefs,
             defaultColDef=defaultColDef,
             dashGridOptions=dashGridOptions,
@@ -111,6 +109,7 @@ query_to_col['fa'] = {
     'multiCountry': {'field': 'Multi Country', 'type': 'bool'},
 }
 col_to_query['fa'] = {v['field']: k for k, v in query_to_col['fa'].items()}
+grid_data['fa'] = df_FA
 
 
 @callback(
@@ -157,11 +156,12 @@ def fa_cat_bar_click(click_data, filter_model):
 def fa_histogram_click(click_data, filter_model):
     if not click_data:
         return no_update
-    # need to rework the bins first
-
-    # print(click_data)
-    return no_update
 
-    # selected_partner = click_data['points'][0]['y']
-    # filter_model['Delivery Partner'] = {'filterType': 'text', 'type': 'contains', 'filter': selected_partner}
-    # return filter_model
+    # the bins are [left, right), which the grid inRange filter can't express as its bounds are excluded. The AND of
+    # the 2 conditions is written in the url like ?FAfin=left&FAfinOperator=greaterThanOrEqual&FAfin=right&...
+    left, right = click_data['points'][0]['customdata'][:2]
+    filter_model['FA Financing'] = {'filterType': 'number', 'operator': 'AND', 'conditions': [
+        {'filterType': 'number', 'type': 'greaterThanOrEqual', 'filter': left},
+        {'filterType': 'number', 'type': 'lessThan', 'filter': right},
+    ]}
+    return filter_model
@@ -13,12 +13,51 @@ from plotly.subplots import make_subplots
 
 import pandas as pd
 
-from app_config import df_FA, format_money_number_si, SECONDARY_COLOR, PRIMARY_COLOR
+from app_config import df_FA, format_money_numbers_si, SECONDARY_COLOR, PRIMARY_COLOR, grid_rows_df, \
+    grid_rows_aggregate, GRID_ROWS_PROP, themed_figure
+
+# bins numbers to have nice splits
+bins_number_list = [2, 4, 8, 19, 38, 76, 188]
+
+
+def histogram_data(df, max_bins):
+    # projects number by financing bin, binned on the server to only send the bins to the browser. The bins are
+    # 'nice' like the plotly autobins (1, 2 or 5 x 10^n wide, aligned on their width, at most max_bins) and
+    # [left, right) as the max is always inside the last bin, so a bin is the rows filtered by left <= financing < right
+    values = df['FA Financing'].dropna().to_numpy()
+    if not len(values):
+        return pd.DataFrame({'left': [], 'right': [], 'Number': []})
+    low, high = values.min(), values.max()
+    # the bins of a single value are sized from the value
+    span = high - low or max(abs(high), 1)
+    magnitude = 10 ** np.floor(np.log10(span / max_bins))
+    for size in [1 * magnitude, 2 * magnitude, 5 * magnitude, 10 * magnitude, 20 * magnitude]:
+        start = np.floor(low / size) * size
+        bins_number = int((high - start) // size) + 1
+        if bins_number <= max_bins:
+            break
+    edges = start + size * np.arange(bins_number + 1)
+    counts, _ = np.histogram(values, edges)
+    return pd.DataFrame({'left': edges[:-1], 'right': edges[1:], 'Number': counts})
+
+
+def histogram_trace(dff):
+    # bar trace of the bins, with their edges in customdata to filter the grid on click
+    # use custom function to have $1B instead of $1G, as it is not possible with D3-formatting
+    labels = format_money_numbers_si(np.concatenate([dff['left'], dff['right']]))
+    return dict(
+        x=(dff['left'] + dff['right']) / 2,
+        y=dff['Number'],
+        width=dff['right'] - dff['left'],
+        customdata=list(zip(dff['left'], dff['right'],
+                            [f"{left} - {right}" for left, right in zip(labels[:len(dff)], labels[len(dff):])])),
+    )
+
 
 fig = go.Figure()
 
-fig.add_histogram(
-    x=df_FA['FA Financing'],
+fig.add_bar(
+    **histogram_trace(histogram_data(df_FA, 19)),
     marker=dict(
         color=PRIMARY_COLOR,
         line={'color': PRIMARY_COLOR, 'width': 2},
@@ -28,7 +67,7 @@ fig.add_histogram(
     ),
     textfont_color='var(--mantine-color-text)', textangle=0,
     hovertemplate="<b>%{y}</b> Projects In The Range<br>"
-                  "<b>[%{x}]</b><extra></extra>",
+                  "<b>[%{customdata[2]}]</b><extra></extra>",
 )
 
 fig.update_xaxes(
@@ -48,9 +87,11 @@ fig.update_layout(
     barcornerradius=5,  # radius of the corners of the bars
 )
 
+# plotly JSON of the figure, shared by the renders that overlay their theme on it
+base_fig = fig.to_plotly_json()
+
 
 def fa_histogram(theme='light'):
-    fig.update_layout(template=pio.templates[f"mantine_{theme}"])
     return dmc.Stack([
         dmc.Group([
             dmc.ButtonGroup([
@@ -71,10 +112,10 @@ def fa_histogram(theme='light'):
         dcc.Graph(
             id={'type': 'figure', 'subtype': 'histogram', 'index': 'fa'},
             config={'displayModeBar': False}, responsive=True,
-            figure=fig,
+            figure=themed_figure(base_fig, theme),
             style={"flex": 1}
         ),
-        # Note: we need to use a store to keep the nbinsx value (max bins) as it is not saved as param in fig
+        # Note: we need to use a store to keep the max bins number, the bins being computed by the callback
         dcc.Store(id='fa-histogram-nbinsx-store', data=19)
     ], p=10, style={"flex": 1})
 
@@ -84,43 +125,32 @@ def fa_histogram(theme='light'):
     Output('fa-histogram-nbinsx-store', 'data'),
     Input('fa-histogram-minus-btn', 'n_clicks'),
     Input('fa-histogram-plus-btn', 'n_clicks'),
+    Input({'type': 'grid', 'index': 'fa'}, GRID_ROWS_PROP),
     State('fa-histogram-nbinsx-store', 'data'),
     prevent_initial_call=True
 )
-def update_max_bins(_1, _2, nbinsx):
-    # bins numbers to have nice splits
-    bins_number_list = [2, 4, 8, 19, 38, 76, 188]
-
-    current_index = bins_number_list.index(nbinsx)
-    new_index = current_index + 1 if ctx.triggered_id == 'fa-histogram-minus-btn' else current_index - 1
-    # check to stay inside the list
-    if new_index < 0:
-        new_index = 0
-    elif new_index >= len(bins_number_list):
-        new_index = len(bins_number_list) - 1
-
-    new_nbinsx = bins_number_list[new_index]
-
-    patched_fig = Patch()
-    patched_fig["data"][0]['nbinsx'] = new_nbinsx
-    return patched_fig, new_nbinsx
+def update_histogram_data(_1, _2, grid_rows, nbinsx):
+    new_nbinsx = nbinsx
+    if ctx.triggered_id in ['fa-histogram-minus-btn', 'fa-histogram-plus-btn']:
+        current_index = bins_number_list.index(nbinsx)
+        new_index = current_index + 1 if ctx.triggered_id == 'fa-histogram-minus-btn' else current_index - 1
+        # check to stay inside the list
+        if new_index < 0:
+            new_index = 0
+        elif new_index >= len(bins_number_list):
+            new_index = len(bins_number_list) - 1
+
+        new_nbinsx = bins_number_list[new_index]
 
-
-@callback(
-    Output({'type': 'figure', 'subtype': 'histogram', 'index': 'fa'}, "figure", allow_duplicate=True),
-    Input({'type': 'grid', 'index': 'fa'}, "virtualRowData"),
-    prevent_initial_call=True
-)
-def update_x(virtual_data):
     patched_fig = Patch()
-    if not virtual_data:
-        patched_fig["data"][0]['x'] = None
-        return patched_fig
+    dff = grid_rows_df('fa', grid_rows)
+    if dff.empty:
+        patched_fig["data"][0].update({'x': None, 'y': None, 'width': None, 'customdata': None})
+        return patched_fig, new_nbinsx
 
-    dff = pd.DataFrame(virtual_data)
-
-    patched_fig["data"][0]['x'] = dff['FA Financing']
-    return patched_fig
+    dff = grid_rows_aggregate('fa', grid_rows, f'histogram-{new_nbinsx}', lambda df: histogram_data(df, new_nbinsx))
+    patched_fig["data"][0].update(histogram_trace(dff))
+    return patched_fig, new_nbinsx
 
 
 @callback(
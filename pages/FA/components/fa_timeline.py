@@ -11,7 +11,8 @@ import plotly.express as px
 
 import pandas as pd
 
-from app_config import df_FA, PRIMARY_COLOR, SECONDARY_COLOR, format_money_number_si
+from app_config import df_FA, PRIMARY_COLOR, SECONDARY_COLOR, format_money_numbers_si, grid_rows_df, GRID_ROWS_PROP, \
+    themed_figure
 
 # the keys will be used for the carousel, the values will be used for the traces order and color
 cat_cols = {
@@ -21,7 +22,7 @@ cat_cols = {
                      'Micro': '#1569a1', '*Missing*': '#9b59b6'},
     'ESS Category': {'Category C': '#15a14a', 'Category B': '#27ae60', 'Category A': '#2ecc71',
                      'Intermediation 3': '#1569a1', 'Intermediation 2': '#2980b9', 'Intermediation 1': '#3498db'},
-    'Priority State': {'Priority States': '#15a14a', 'Not Priority States': '#1569a1'},
+    'Priority States': {'Priority States': '#15a14a', 'Not Priority States': '#1569a1'},
     'Multi Country': {'Single Country Projects': '#15a14a', 'Multiple Countries Projects': '#1569a1'},
     'Modality': {'PAP': '#15a14a', 'SAP': '#1569a1'},
 }
@@ -29,12 +30,27 @@ total_color = '#d4ac0d'
 
 col_init = 'Theme'
 
-# get the sum financing and nb of project by board meeting and selected col
-dff = df_FA.groupby([col_init, 'BM'])['FA Financing'].sum().reset_index()
-group_sizes = df_FA.groupby([col_init, 'BM']).size().reset_index(name='Number')
-dff = pd.merge(dff, group_sizes, on=[col_init, 'BM'])
+# names of the cats of the bool cols
+bool_cats = {
+    'Priority States': {True: 'Priority States', False: 'Not Priority States'},
+    'Multi Country': {True: 'Multiple Countries Projects', False: 'Single Country Projects'},
+}
+
+
+def timeline_data(df, col):
+    # cumulated financing and number of projects by board meeting (rows) and cat of col (cols), from a single pivot
+    # reindexed on the full range of board meetings
+    pivot = df.pivot_table(index='BM', columns=col, values='FA Financing', aggfunc=['sum', 'size'], fill_value=0)
+    boards = pd.RangeIndex(pivot.index.min(), pivot.index.max() + 1, name='BM')
+    pivot = pivot.reindex(boards, fill_value=0).cumsum()
+    cum_sum, cum_num = pivot['sum'], pivot['size']
+    if col in bool_cats:
+        cum_sum, cum_num = cum_sum.rename(columns=bool_cats[col]), cum_num.rename(columns=bool_cats[col])
+    return cum_sum, cum_num
+
+
 # get the full range of board meetings
-boards = pd.Series(range(dff['BM'].min(), dff['BM'].max() + 1), name='BM')
+boards = pd.Series(range(df_FA['BM'].min(), df_FA['BM'].max() + 1), name='BM')
 
 fig = go.Figure()
 # Note that the traces will be generated by the callback below
@@ -58,9 +74,11 @@ fig.update_layout(
     hovermode="x"
 )
 
+# plotly JSON of the figure, shared by the renders that overlay their theme on it
+base_fig = fig.to_plotly_json()
+
 
 def fa_timeline(theme='light'):
-    fig.update_layout(template=pio.templates[f"mantine_{theme}"])
     return dmc.Stack([
         dmc.Group([
             dmc.Checkbox(id="fa-timeline-total-chk", label="Add Total Line"),
@@ -69,7 +87,7 @@ def fa_timeline(theme='light'):
         dcc.Graph(
             id={'type': 'figure', 'subtype': 'line', 'index': 'fa'},
             config={'displayModeBar': False}, responsive=True,
-            figure=fig,
+            figure=themed_figure(base_fig, theme),
             style={"flex": 1}
         )
     ], p=10, style={"flex": 1})
@@ -81,126 +99,95 @@ def fa_timeline(theme='light'):
     Input("fa-timeline-select", "value"),
     Input("fa-timeline-total-chk", "checked"),
     Input("fa-timeline-stack-chk", "checked"),
-    Input({'type': 'grid', 'index': 'fa'}, "virtualRowData"),
+    Input({'type': 'grid', 'index': 'fa'}, GRID_ROWS_PROP),
     State({'type': 'figure', 'subtype': 'line', 'index': 'fa'}, "figure"),
     prevent_initial_call=True
 )
-def update_fa_timeline_data(carousel1, col, total, stack, virtual_data, fig):
+def update_fa_timeline_data(carousel1, col, total, stack, grid_rows, fig):
     patched_fig = Patch()
-    if not virtual_data:
+    dff_grid = grid_rows_df('fa', grid_rows)
+    if dff_grid.empty:
         for i, trace in enumerate(fig['data']):
             patched_fig["data"][i].update(dict({'x': None, 'y': None}))
         return patched_fig
 
-    dff_grid = pd.DataFrame(virtual_data)
-
-    # get the col name from the carousel index
-    # col = list(cat_cols.keys())[carousel2]
-
-    # get the sum financing and nb of project by board meeting and selected col
-    dff = dff_grid.groupby([col, 'BM'])['FA Financing'].sum().reset_index()
-    group_sizes = dff_grid.groupby([col, 'BM']).size().reset_index(name='Number')
-    dff = pd.merge(dff, group_sizes, on=[col, 'BM'])
-    # get the full range of board meetings
-    boards = pd.Series(range(dff['BM'].min(), dff['BM'].max() + 1), name='BM')
-    # transform bool to yes/no
-    if col == 'Priority State':
-        dff[col] = dff[col].apply(lambda x: 'Priority States' if x else 'Not Priority States')
-    if col == 'Multi Country':
-        dff[col] = dff[col].apply(lambda x: 'Multiple Countries Projects' if x else 'Single Country Projects')
-    # get the total by board meeting
-    dff_total = dff_grid.groupby('BM')['FA Financing'].sum().reset_index()
-    group_sizes_total = dff_grid.groupby('BM').size().reset_index(name='Number')
-    dff_total = pd.merge(dff_total, group_sizes_total, on='BM')
-    # add the missing boards
-    boards_total = pd.Series(range(dff_total['BM'].min(), dff_total['BM'].max() + 1), name='BM')
-    dff_total = pd.merge(boards_total, dff_total, on='BM', how='left').fillna(value=0).sort_values('BM')
-    dff_total['Number'] = dff_total['Number'].astype(int)
-    # get the cumsum of financing and number
-    dff_total['cum-sum'] = dff_total['FA Financing'].cumsum()
-    dff_total['cum-num'] = dff_total['Number'].cumsum()
-
-    # as the number of traces (=cat) is not the same for each col,
-    # we generate a new fig and keep only the 'data' to patch the current fig, so that we keep the layout def
-    data_fig = go.Figure()
-    # loop though cat_cols to keep the order of the cats
-    for cat in cat_cols[col]:
-        # skip the cat if not in dff
-        if cat not in dff[col].unique():
-            continue
-        # merge with Board series to add the missing boards for that cat, add 0 for missing boards and
-        # sort by BM to be sure there are ordered for the cumulated sum
-        df_cat = pd.merge(boards, dff[dff[col] == cat], on='BM', how='left').fillna(value=0).sort_values('BM')
-        df_cat['Number'] = df_cat['Number'].astype(int)
-        # get the cumsum of financing and number and their percentage
-        df_cat['cum-sum'] = df_cat['FA Financing'].cumsum()
-        df_cat['cum-sum %'] = df_cat['cum-sum'] / dff_total['cum-sum']
-        df_cat['cum-num'] = df_cat['Number'].cumsum()
-        df_cat['cum-num %'] = df_cat['cum-num'] / dff_total['cum-num']
-
+    # cumulated financing and number of each cat of col (cols of the matrices) by board meeting, the total being the
+    # sum of the cats as the cat cols have no missing values (see the *Missing* Project Size)
+    cum_sum, cum_num = timeline_data(dff_grid, col)
+    boards = cum_sum.index
+    total_cum_sum = cum_sum.sum(axis=1)
+    total_cum_num = cum_num.sum(axis=1)
+    cum_sum_pct = cum_sum.div(total_cum_sum, axis=0)
+    cum_num_pct = cum_num.div(total_cum_num, axis=0)
+    # display only the last marker and label
+    opacity = [0] * (len(boards) - 1) + [1]
+
+    # as the number of traces (=cat) is not the same for each col, the whole 'data' is patched as plain dicts,
+    # so that we keep the layout def
+    data = []
+    # loop though cat_cols to keep the order of the cats, skipping the cats not in dff
+    for cat in [cat for cat in cat_cols[col] if cat in cum_sum.columns]:
         # use custom function to have $1B instead of $1G, as it is not possible with D3-formatting
-        customdata = list(zip(
-            [format_money_number_si(val) for val in df_cat['cum-sum']],
-            df_cat['cum-num'], df_cat['cum-sum %'], df_cat['cum-num %']
-        ))
+        cum_sum_labels = format_money_numbers_si(cum_sum[cat])
+        customdata = list(zip(cum_sum_labels, cum_num[cat], cum_sum_pct[cat], cum_num_pct[cat]))
 
         # carousel1 0=Financing 1=Number
-        last_cum_sum = format_money_number_si(df_cat['cum-sum'].iloc[-1])
-        last_cum_num = df_cat['cum-num'].iloc[-1]
+        last_cum_sum = cum_sum_labels[-1]
+        last_cum_num = cum_num[cat].iloc[-1]
         if carousel1:
-            y = df_cat['cum-num']
-            # display only the last marker and label
-            text = [''] * (len(df_cat) - 1) + [f"{last_cum_num} ({last_cum_sum})"]
+            y = cum_num[cat]
+            text = [''] * (len(boards) - 1) + [f"{last_cum_num} ({last_cum_sum})"]
             hovertemplate = '<b>%{customdata[1]}</b> (%{customdata[0]})<br>%{customdata[3]:.0%} of Total'
         else:
-            y = df_cat['cum-sum']
-            # use custom function to have $1B instead of $1G, as it is not possible with D3-formatting
-            text = [''] * (len(df_cat) - 1) + [f"{last_cum_sum} ({last_cum_num})"]
+            y = cum_sum[cat]
+            text = [''] * (len(boards) - 1) + [f"{last_cum_sum} ({last_cum_num})"]
             hovertemplate = '<b>%{customdata[0]}</b> (%{customdata[1]})<br>%{customdata[2]:.0%} of Total'
 
-        data_fig.add_scatter(
+        trace = dict(
+            type='scatter',
             name=cat,
             mode='lines+markers+text',
-            x=df_cat['BM'],
+            x=boards,
             y=y,
-            stackgroup='one' if stack else None,
             line={'color': cat_cols[col][cat], 'width': 3},
-            # display only the last marker and label
-            marker={'size': 10, 'opacity': [0] * (len(df_cat) - 1) + [1]},
+            marker={'size': 10, 'opacity': opacity},
             text=text, texttemplate="%{text}", textposition="middle right",
             textfont={'size': 14, 'color': cat_cols[col][cat], 'weight': "bold"},
             customdata=customdata, hovertemplate=hovertemplate,
         )
+        if stack:
+            trace['stackgroup'] = 'one'
+        data.append(trace)
 
     # add total if selected
     if total:
         # use custom function to have $1B instead of $1G, as it is not possible with D3-formatting
-        customdata = list(zip(
-            [format_money_number_si(val) for val in dff_total['cum-sum']], dff_total['cum-num']
-        ))
+        cum_sum_labels = format_money_numbers_si(total_cum_sum)
+        customdata = list(zip(cum_sum_labels, total_cum_num))
 
         # carousel1 0=Financing 1=Number
         if carousel1:
-            y = dff_total['cum-num']
-            text = [''] * (len(dff_total) - 1) + [dff_total['cum-num'].iloc[-1]]
+            y = total_cum_num
+            text = [''] * (len(boards) - 1) + [str(total_cum_num.iloc[-1])]
             hovertemplate = '<b>%{customdata[1]}</b> (%{customdata[0]})'
         else:
-            y = dff_total['cum-sum']
-            text = [''] * (len(dff_total) - 1) + [format_money_number_si(dff_total['cum-sum'].iloc[-1])]
+            y = total_cum_sum
+            text = [''] * (len(boards) - 1) + [cum_sum_labels[-1]]
             hovertemplate = '<b>%{customdata[0]}</b> (%{customdata[1]})'
 
-        data_fig.add_scatter(
+        data.append(dict(
+            type='scatter',
             name='Total',
             mode='lines+markers+text',
-            x=dff_total['BM'], y=y,
+            x=boards, y=y,
             line={'color': total_color, 'width': 3},
-            marker={'size': 10, 'opacity': [0] * (len(dff_total) - 1) + [1]},
+            marker={'size': 10, 'opacity': opacity},
             text=text, texttemplate="%{text}", textposition="middle left",
             textfont={'size': 14, 'color': total_color, 'weight': "bold"},
             customdata=customdata, hovertemplate=hovertemplate,
-        )
+        ))
 
-    patched_fig["data"] = data_fig["data"]
+    patched_fig["data"] = data
     patched_fig["layout"]["xaxis"]["range"] = [boards.min(), boards.max()]
     patched_fig["layout"]["yaxis"]["title"]["text"] = 'Number of Projects' if carousel1 else 'Financing'
     patched_fig["layout"]["yaxis"]["tickprefix"] = None if carousel1 else '$'
@@ -1,12 +1,14 @@
+import json
 import os
 
 import pandas as pd
-from dash import Input, Output, State, callback, no_update, Patch, html
+from dash import Input, Output, State, callback, clientside_callback, no_update, Patch, html
 import dash_ag_grid as dag
 
 from dotenv import load_dotenv
 
-from app_config import df_countries, header_template_with_icon, query_to_col, col_to_query
+from app_config import df_countries, header_template_with_icon, query_to_col, col_to_query, \
+    grid_data, grid_rows_props, grid_rows_df, GRID_ROWS_PROP, GRID_ROW_MODEL
 
 # load env variable to know if the app is local or deployed
 load_dotenv()
@@ -34,7 +36,8 @@ columnDefs = [
         ''',
      "cellRenderer": "CountriesCell",
      # special styling for the bottom pinned row 'total' cell
-     'colSpan': {"function": "params.data['Country Name'] === 'TOTAL' ? 2 : 1"},
+     # Note: the data is undefined for rows not loaded yet with the infinite row model
+     'colSpan': {"function": "params.data && params.data['Country Name'] === 'TOTAL' ? 2 : 1"},
      'cellStyle': {"function": "params.value == 'TOTAL' && {'display': 'flex', 'justifyContent': 'flex-end'}"},
      "filterParams": {"maxNumConditions": 200, "buttons": ["reset"]},
      },
@@ -112,7 +115,7 @@ def countries_grid(theme='light'):
     return html.Div([
         dag.AgGrid(
             id={'type': 'grid', 'index': 'countries'},
-            rowData=df_countries.to_dict("records"),
+            **grid_rows_props(df_countries),
             columnDefs=columnDefs,
             defaultColDef=defaultColDef,
             dashGridOptions=dashGridOptions,
@@ -139,23 +142,38 @@ query_to_col['countries'] = {
     'FAnb': {'field': '# FA', 'type': 'num'},
 }
 col_to_query['countries'] = {v['field']: k for k, v in query_to_col['countries'].items()}
-
-
-@callback(
-    Output({'type': 'grid', 'index': 'countries'}, "dashGridOptions"),
-    Input({'type': 'grid', 'index': 'countries'}, "virtualRowData"),
-)
-def row_pinning_bottom(virtual_data):
-    if not virtual_data:
-        return no_update
-
-    cols = ['SIDS', 'LDC', 'AS', 'RP Financing $', '# RP', 'FA Financing $', '# FA']
-    dff = pd.DataFrame(virtual_data, columns=cols)
-    totals = dff[cols].sum()
-
-    grid_option_patch = Patch()
-    grid_option_patch["pinnedBottomRowData"] = [{"Country Name": "TOTAL", **{col: totals[col] for col in cols}}]
-    return grid_option_patch
+grid_data['countries'] = df_countries
+
+
+# Note: the TOTAL row is computed in the browser from the displayed rows, except with the infinite row model that
+# keeps the rows on the server
+if GRID_ROW_MODEL == 'infinite':
+    @callback(
+        Output({'type': 'grid', 'index': 'countries'}, "dashGridOptions"),
+        Input({'type': 'grid', 'index': 'countries'}, GRID_ROWS_PROP),
+    )
+    def row_pinning_bottom(grid_rows):
+        dff = grid_rows_df('countries', grid_rows)
+        if dff.empty:
+            return no_update
+
+        totals = dff[total_cols].sum()
+
+        grid_option_patch = Patch()
+        grid_option_patch["pinnedBottomRowData"] = [
+            {"Country Name": "TOTAL", **{col: totals[col] for col in total_cols}}
+        ]
+        return grid_option_patch
+else:
+    clientside_callback(
+        """
+        function(virtualRowData) {
+            return dash_clientside.grids.pinnedTotalRow(virtualRowData, "Country Name", %s);
+        }
+        """ % json.dumps(total_cols),
+        Output({'type': 'grid', 'index': 'countries'}, "dashGridOptions"),
+        Input({'type': 'grid', 'index': 'countries'}, "virtualRowData"),
+    )
 
 
 @callback(
@@ -163,10 +181,10 @@ def row_pinning_bottom(virtual_data):
     Output("url-location", "search", allow_duplicate=True),
     Output("url-location", "refresh", allow_duplicate=True),
     Input({'type': 'grid', 'index': 'countries'}, "cellRendererData"),
-    State({'type': 'grid', 'index': 'countries'}, "virtualRowData"),
+    State({'type': 'grid', 'index': 'countries'}, GRID_ROWS_PROP),
     prevent_initial_call=True
 )
-def cell_icon_click(click_data, virtual_data):
+def cell_icon_click(click_data, grid_rows):
     if not click_data:
         return no_update
 
@@ -175,7 +193,7 @@ def cell_icon_click(click_data, virtual_data):
 
     if click_data['colId'] == '# RP':
         if click_data['value'] == 'TOTAL':
-            countries = [row['Country Name'].replace(' ', '_') for row in virtual_data]
+            countries = grid_rows_df('countries', grid_rows)['Country Name'].str.replace(' ', '_')
             query = f"?{col_to_query['readiness']['Country']}={'+'.join(countries)}"
         else:
             query = f"?{col_to_query['readiness']['Country']}={click_data['value'].replace(' ', '_')}"
@@ -183,7 +201,7 @@ def cell_icon_click(click_data, virtual_data):
 
     elif click_data['colId'] == '# FA':
         if click_data['value'] == 'TOTAL':
-            countries = [row['Country Name'].replace(' ', '_') for row in virtual_data]
+            countries = grid_rows_df('countries', grid_rows)['Country Name'].str.replace(' ', '_')
             query = f"?{col_to_query['fa']['Countries']}={'+'.join(countries)}"
         else:
             query = f"?{col_to_query['fa']['Countries']}={click_data['value'].replace(' ', '_')}"
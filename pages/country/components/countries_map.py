@@ -9,7 +9,7 @@ import plotly.io as pio
 
 import pandas as pd
 
-from app_config import df_countries
+from app_config import df_countries, grid_rows_df, GRID_ROWS_PROP, themed_figure
 
 fig = go.Figure()
 
@@ -50,10 +50,11 @@ fig.update_layout(
     )
 )
 
+# plotly JSON of the figure, shared by the renders that overlay their theme on it
+base_fig = fig.to_plotly_json()
+
 
 def countries_map(theme='light'):
-    fig.update_layout(template=pio.templates[f"mantine_{theme}"],
-                      geo_landcolor='#f1f3f5' if theme == 'light' else '#1f1f1f')
     return dmc.Stack([
         dmc.Group(
             [
@@ -79,7 +80,8 @@ def countries_map(theme='light'):
             id={'type': 'figure', 'subtype': 'map', 'index': 'countries'},
             config={'displayModeBar': False},
             responsive=True,
-            figure=fig,
+            figure=themed_figure(base_fig, theme, geo={
+                **base_fig['layout']['geo'], 'landcolor': '#f1f3f5' if theme == 'light' else '#1f1f1f'}),
             style={'height': '100%'},
         )
     ], p=10, style={"flex": 1})
@@ -90,17 +92,16 @@ def countries_map(theme='light'):
     Input("countries-map-carousel-1", "active"),
     Input("countries-map-carousel-2", "active"),
     Input("countries-map-carousel-3", "active"),
-    Input({'type': 'grid', 'index': 'countries'}, "virtualRowData"),
+    Input({'type': 'grid', 'index': 'countries'}, GRID_ROWS_PROP),
     prevent_initial_call=True
 )
-def update_map_data(carousel_1, carousel_2, carousel_3, virtual_data):
+def update_map_data(carousel_1, carousel_2, carousel_3, grid_rows):
     patched_fig = Patch()
-    if not virtual_data:
+    dff = grid_rows_df('countries', grid_rows)
+    if dff.empty:
         patched_fig["data"][0]['z'] = None
         return patched_fig
 
-    dff = pd.DataFrame(virtual_data)
-
     activity = 'FA' if carousel_1 else 'RP'  # 0=Readiness, 1=Funded Activities
 
     # financing|# and None|region_sum
@@ -120,7 +121,7 @@ def update_map_data(carousel_1, carousel_2, carousel_3, virtual_data):
     patched_fig["data"][0].update(dict(
         locations=dff['ISO3'],
         z=dff[z_col],
-        customdata=list(zip(dff[customdata_0_col], dff[customdata_1_col])),
+        customdata=dff[[customdata_0_col, customdata_1_col]].to_numpy(),
         hovertemplate=f'%{{z{z_format}}} (%{{customdata[0]{customdata_0_format}}})<extra>%{{customdata[1]}}</extra>',
         colorbar={'tickformat': '' if carousel_2 else '$.4s'},
     ))
@@ -9,21 +9,25 @@ import plotly.io as pio
 
 import pandas as pd
 
-from app_config import df_countries
+from app_config import df_countries, grid_rows_df, grid_rows_aggregate, GRID_ROWS_PROP, countries_cube_cells, \
+    countries_cube_sums, themed_figure
+
+# labels of the countries cube cells, formatted once for all
+parcats_cells = countries_cube_cells.replace({True: 'Yes', False: 'No'})
+parcats_cells['Region'] = parcats_cells['Region'].apply(
+    lambda x: 'Latin America<br>and the Caribbean' if 'Latin' in x
+    else 'Western Europe<br>and Others' if 'Western' in x
+    else x
+)
 
 
 def format_df_for_parcats(df):
-    df = df.groupby(['Priority States', 'SIDS', 'LDC', 'AS', 'Region'], as_index=False).sum()
-    df.replace({True: 'Yes', False: 'No'}, inplace=True)
-    df['Region'] = df['Region'].apply(
-        lambda x: 'Latin America<br>and the Caribbean' if 'Latin' in x
-        else 'Western Europe<br>and Others' if 'Western' in x
-        else x
-    )
-    return df
+    # sums of the df rows by cube cell, looked up instead of grouped
+    sums = countries_cube_sums(df.index)
+    return parcats_cells.loc[sums.index].join(sums).reset_index(drop=True)
 
 
-dff = format_df_for_parcats(df_countries.copy())
+dff = format_df_for_parcats(df_countries)
 
 dimensions = [
     go.parcats.Dimension(label=col.upper(), values=dff[col], categoryorder='category descending')
@@ -55,9 +59,11 @@ fig.update_layout(
     margin={"t": 30, "r": 70, "b": 30, "l": 20},
 )
 
+# plotly JSON of the figure, shared by the renders that overlay their theme on it
+base_fig = fig.to_plotly_json()
+
 
 def countries_parcats(theme='light'):
-    fig.update_layout(template=pio.templates[f"mantine_{theme}"])
     return dmc.Stack([
         dmc.Tooltip(
             dmc.Checkbox(id="countries-parcats-chk", label="Highlight Priority States Lines", checked=True, fz=16),
@@ -68,7 +74,7 @@ def countries_parcats(theme='light'):
         dcc.Graph(
             id={'type': 'figure', 'subtype': 'parcats', 'index': 'countries'},
             config={'displayModeBar': False}, responsive=True,
-            figure=fig,
+            figure=themed_figure(base_fig, theme),
             style={"flex": 1}
         )
     ], p=10, style={"flex": 1})
@@ -78,17 +84,19 @@ def countries_parcats(theme='light'):
     Output({'type': 'figure', 'subtype': 'parcats', 'index': 'countries'}, "figure", allow_duplicate=True),
     Input("countries-parcats-carousel-1", "active"),
     Input("countries-parcats-carousel-2", "active"),
-    Input({'type': 'grid', 'index': 'countries'}, "virtualRowData"),
+    Input({'type': 'grid', 'index': 'countries'}, GRID_ROWS_PROP),
     prevent_initial_call=True
 )
-def update_parcats_data(carousel_1, carousel_2, virtual_data):
+def update_parcats_data(carousel_1, carousel_2, grid_rows):
     patched_fig = Patch()
-    if not virtual_data:
+    dff = grid_rows_df('countries', grid_rows)
+    if dff.empty:
         for i, dim in enumerate(['Priority States', 'SIDS', 'LDC', 'AS', 'Region']):
             patched_fig["data"][0]['dimensions'][i]['values'] = None
         return patched_fig
 
-    dff = format_df_for_parcats(pd.DataFrame(virtual_data))
+    # shared with highlight_priority_countries() triggered by the same grid rows
+    dff = grid_rows_aggregate('countries', grid_rows, 'parcats', format_df_for_parcats)
 
     col = 'FA' if carousel_1 else 'RP'  # 0=Readiness, 1=Funded Activities
     col = f"# {col}" if carousel_2 else f"{col} Financing $"  # 0=Financing, 1=Number
@@ -114,14 +122,15 @@ def update_parcats_data(carousel_1, carousel_2, virtual_data):
 @callback(
     Output({'type': 'figure', 'subtype': 'parcats', 'index': 'countries'}, "figure", allow_duplicate=True),
     Input("countries-parcats-chk", "checked"),
-    Input({'type': 'grid', 'index': 'countries'}, "virtualRowData"),
+    Input({'type': 'grid', 'index': 'countries'}, GRID_ROWS_PROP),
     prevent_initial_call=True
 )
-def highlight_priority_countries(checked, virtual_data):
-    if not virtual_data:
+def highlight_priority_countries(checked, grid_rows):
+    dff = grid_rows_df('countries', grid_rows)
+    if dff.empty:
         return no_update
 
-    dff = format_df_for_parcats(pd.DataFrame(virtual_data))
+    dff = grid_rows_aggregate('countries', grid_rows, 'parcats', format_df_for_parcats)
     color = dff['Priority States'].apply(lambda x: 0 if x == 'Yes' else 1) if checked else '#15a14a'
 
     patched_fig = Patch()
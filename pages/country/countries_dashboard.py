@@ -10,7 +10,7 @@ from dash_iconify import DashIconify
 import pandas as pd
 
 import pages.country.components as components
-from app_config import text_carousel
+from app_config import text_carousel, rendered_children, dashboards_children
 
 register_page(
     __name__,
@@ -29,15 +29,7 @@ register_page(
 layout = dmc.Stack(id='countries-container', w='100%', style={"flex": 1}, align='center')
 
 
-# we use a callback to render the children to be able to provide the theme before they render
-# to avoid flickering at init and when switching dashboard
-@callback(
-    Output('countries-container', "children"),
-    Input('countries-container', "id"),
-    State("color-scheme-switch", "checked"),
-)
-def render_children(_, checked):
-    theme = 'light' if checked else 'dark'
+def countries_children(theme):
     return [
         dmc.Group([
             dmc.Card([
@@ -93,3 +85,18 @@ def render_children(_, checked):
         components.countries_grid(theme)
 
     ]
+
+
+dashboards_children['countries'] = countries_children
+
+
+# we use a callback to render the children to be able to provide the theme before they render
+# to avoid flickering at init and when switching dashboard
+@callback(
+    Output('countries-container', "children"),
+    Input('countries-container', "id"),
+    State("color-scheme-switch", "checked"),
+)
+def render_children(_, checked):
+    theme = 'light' if checked else 'dark'
+    return rendered_children('countries', theme, countries_children)
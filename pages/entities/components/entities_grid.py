@@ -8,10 +8,8 @@ import dash_ag_grid as dag
 import dash_mantine_components as dmc
 from dash_iconify import DashIconify
 
-from app_config import df_entities, header_template_with_icon, query_to_col, col_to_query
-
-# sort by ref for the default order in the grid
-df_entities.sort_values('Entity', inplace=True, na_position='last')
+from app_config import df_entities, header_template_with_icon, query_to_col, col_to_query, \
+    grid_data, grid_rows_props, grid_rows_df, GRID_ROWS_PROP, GRID_ROW_MODEL
 
 total_cols = ['FA Financing', '# Approved']
 totals = df_entities[total_cols].sum()
@@ -19,7 +17,8 @@ totals = df_entities[total_cols].sum()
 columnDefs = [
     {'field': 'Entity', 'tooltipField': 'Entity', 'width': 120,
      # special styling for the bottom pinned row 'total' cell
-     'colSpan': {"function": "params.data['Entity'] === 'TOTAL' ? 9 : 1"},
+     # Note: the data is undefined for rows not loaded yet with the infinite row model
+     'colSpan': {"function": "params.data && params.data['Entity'] === 'TOTAL' ? 9 : 1"},
      'cellStyle': {"function": "params.value == 'TOTAL' && {'display': 'flex', 'justifyContent': 'flex-end'}"},
      },
     {'field': 'Name', 'tooltipField': 'Name', 'width': 300},
@@ -78,7 +77,7 @@ def entities_grid(theme='light'):
     return html.Div([
         dag.AgGrid(
             id={'type': 'grid', 'index': 'entities'},
-            rowData=df_entities.to_dict("records"),
+            **grid_rows_props(df_entities),
             columnDefs=columnDefs,
             defaultColDef=defaultColDef,
             dashGridOptions=dashGridOptions,
@@ -105,23 +104,36 @@ query_to_col['entities'] = {
     'FAnb': {'field': '# Approved', 'type': 'num'},
 }
 col_to_query['entities'] = {v['field']: k for k, v in query_to_col['entities'].items()}
-
-
-@callback(
-    Output({'type': 'grid', 'index': 'entities'}, "dashGridOptions"),
-    Input({'type': 'grid', 'index': 'entities'}, "virtualRowData"),
-)
-def row_pinning_bottom(virtual_data):
-    if not virtual_data:
-        return no_update
-
-    cols = ['FA Financing', '# Approved']
-    dff = pd.DataFrame(virtual_data, columns=cols)
-    totals = dff[cols].sum()
-
-    grid_option_patch = Patch()
-    grid_option_patch["pinnedBottomRowData"] = [{"Entity": "TOTAL", **{col: totals[col] for col in cols}}]
-    return grid_option_patch
+grid_data['entities'] = df_entities
+
+
+# Note: the TOTAL row is computed in the browser from the displayed rows, except with the infinite row model that
+# keeps the rows on the server
+if GRID_ROW_MODEL == 'infinite':
+    @callback(
+        Output({'type': 'grid', 'index': 'entities'}, "dashGridOptions"),
+        Input({'type': 'grid', 'index': 'entities'}, GRID_ROWS_PROP),
+    )
+    def row_pinning_bottom(grid_rows):
+        dff = grid_rows_df('entities', grid_rows)
+        if dff.empty:
+            return no_update
+
+        totals = dff[total_cols].sum()
+
+        grid_option_patch = Patch()
+        grid_option_patch["pinnedBottomRowData"] = [{"Entity": "TOTAL", **{col: totals[col] for col in total_cols}}]
+        return grid_option_patch
+else:
+    clientside_callback(
+        """
+        function(virtualRowData) {
+            return dash_clientside.grids.pinnedTotalRow(virtualRowData, "Entity", %s);
+        }
+        """ % json.dumps(total_cols),
+        Output({'type': 'grid', 'index': 'entities'}, "dashGridOptions"),
+        Input({'type': 'grid', 'index': 'entities'}, "virtualRowData"),
+    )
 
 
 @callback(
@@ -129,10 +141,10 @@ def row_pinning_bottom(virtual_data):
     Output("url-location", "search", allow_duplicate=True),
     Output("url-location", "refresh", allow_duplicate=True),
     Input({'type': 'grid', 'index': 'entities'}, "cellRendererData"),
-    State({'type': 'grid', 'index': 'entities'}, "virtualRowData"),
+    State({'type': 'grid', 'index': 'entities'}, GRID_ROWS_PROP),
     prevent_initial_call=True
 )
-def cell_icon_click(click_data, virtual_data):
+def cell_icon_click(click_data, grid_rows):
     if not click_data:
         return no_update
 
@@ -140,7 +152,7 @@ def cell_icon_click(click_data, virtual_data):
     base_path = os.getenv('DASH_URL_BASE_PATHNAME', '/')
 
     if click_data['value'] == 'TOTAL':
-        entities = [row['Entity'].replace(' ', '_') for row in virtual_data]
+        entities = grid_rows_df('entities', grid_rows)['Entity'].str.replace(' ', '_')
         query = f"?{col_to_query['fa']['Entity']}={'+'.join(entities)}"
     else:
         query = f"?{col_to_query['fa']['Entity']}={click_data['value'].replace(' ', '_')}"
@@ -7,31 +7,43 @@ import dash_mantine_components as dmc
 import plotly.graph_objects as go
 import plotly.io as pio
 
+import numpy as np
 import pandas as pd
 
-from app_config import df_entities, PRIMARY_COLOR, format_money_number_si
+from app_config import df_entities, PRIMARY_COLOR, format_money_numbers_si, grid_rows_df, grid_rows_aggregate, \
+    GRID_ROWS_PROP, themed_figure
 
-# dataset for the entities map
-dff = df_entities.groupby('Country').agg(
-    {'Alpha-3 code': 'first', 'Entity': 'count', '# Approved': 'sum', 'FA Financing': 'sum'}).reset_index()
+# hover fragment of each entity, its acronym and name restricted to 70 chars by line
+name_fragments = '<b>' + df_entities['Entity'].astype(str) + '</b> (' + df_entities['Name'].astype(str) + ')'
+name_fragments = name_fragments.where(name_fragments.str.len() <= 70, name_fragments.str[:67] + '...')
+
+# cache of the hover names of each country with all its entities, and of its number of entities
+country_names = name_fragments.groupby(df_entities['Country']).agg('<br>'.join)
+country_sizes = df_entities.groupby('Country').size()
 
 
-# add col for hover data aggregating entities names and acronym and restrict the nb of char by line
-def join_names(group, max_chars_per_line=70):
-    names = []
-    for entity, name in zip(group['Entity'], group['Name']):
-        item = f"<b>{entity}</b> ({name})"
-        if len(item) > max_chars_per_line:
-            item = item[:max_chars_per_line - 3] + "..."  # Truncate and add ellipsis
-        names.append(item)
-    return '<br>'.join(names)
+# add col for hover data aggregating entities names and acronym, only joining the fragments of the countries
+# with some entities filtered out. The names are in the order of df_entities, as the cached ones, whatever the
+# order of the grid rows
+def join_names(df):
+    sizes = df.groupby('Country').size()
+    complete = sizes == country_sizes.reindex(sizes.index)
+    partial_index = df.index[df['Country'].isin(sizes.index[~complete])]
+    partial_index = partial_index[np.argsort(df_entities.index.get_indexer(partial_index), kind='stable')]
+    partial_names = name_fragments.loc[partial_index].groupby(
+        df_entities.loc[partial_index, 'Country']).agg('<br>'.join)
+    return pd.concat([country_names.reindex(sizes.index[complete]), partial_names]).reindex(sizes.index)
 
 
-names_column = df_entities.groupby('Country').apply(
-    join_names, include_groups=False, max_chars_per_line=70).reset_index()
-names_column.rename(columns={0: 'Names'}, inplace=True)
+# dataset for the entities map
+def entities_map_data(df):
+    dff = df.groupby('Country').agg(
+        {'Alpha-3 code': 'first', 'Entity': 'count', '# Approved': 'sum', 'FA Financing': 'sum'})
+    dff['Names'] = join_names(df)
+    return dff.reset_index()
+
 
-dff = pd.merge(dff, names_column, on='Country')
+dff = entities_map_data(df_entities)
 
 fig = go.Figure()
 
@@ -42,7 +54,7 @@ fig.add_choropleth(
     colorbar_tickprefix='$',
     customdata=list(zip(dff['Entity'], dff['# Approved'],
                         # use custom function to have $1B instead of $1G, as it is not possible with D3-formatting
-                        [format_money_number_si(val) for val in dff['FA Financing']],
+                        format_money_numbers_si(dff['FA Financing']),
                         dff['Names'], dff['Country'])),
     hovertemplate='Entity Number: <b>%{customdata[0]}</b><br>'
                   'FA Number: <b>%{customdata[1]}</b><br>'
@@ -78,11 +90,12 @@ fig_distrib.update_layout(
     margin={"r": 0, "t": 0, "l": 0, "b": 15},
 )
 
+# plotly JSON of the figures, shared by the renders that overlay their theme on it
+base_fig = fig.to_plotly_json()
+base_fig_distrib = fig_distrib.to_plotly_json()
+
 
 def entities_map(theme='light'):
-    fig.update_layout(template=pio.templates[f"mantine_{theme}"],
-                      geo_landcolor='#f1f3f5' if theme == 'light' else '#1f1f1f')
-    fig_distrib.update_layout(template=pio.templates[f"mantine_{theme}"])
     return dmc.Stack([
         dmc.Group([
             dmc.Checkbox(id="entities-map-hover-chk", label="Show Entities Names on Hover", w=150,
@@ -92,7 +105,7 @@ def entities_map(theme='light'):
                     id={'type': 'figure', 'index': 'entities-map-distrib'},
                     config={'displayModeBar': False},
                     responsive=True,
-                    figure=fig_distrib,
+                    figure=themed_figure(base_fig_distrib, theme),
                     style={'flex': 1}
                 ),
                 dmc.Slider(
@@ -109,7 +122,8 @@ def entities_map(theme='light'):
         dcc.Graph(
             id={'type': 'figure', 'subtype': 'map', 'index': 'entities'},
             config={'displayModeBar': False}, responsive=True,
-            figure=fig,
+            figure=themed_figure(base_fig, theme, geo={
+                **base_fig['layout']['geo'], 'landcolor': '#f1f3f5' if theme == 'light' else '#1f1f1f'}),
             style={'height': '100%'},
         )
     ], p=10, style={"flex": 1})
@@ -121,28 +135,21 @@ def entities_map(theme='light'):
     Output("entities-map-distrib-slider", "value", allow_duplicate=True),
     Output("entities-map-distrib-slider", "max", allow_duplicate=True),
     Input("entities-map-carousel", "active"),
-    Input({'type': 'grid', 'index': 'entities'}, "virtualRowData"),
+    Input({'type': 'grid', 'index': 'entities'}, GRID_ROWS_PROP),
     prevent_initial_call=True
 )
-def update_map_distrib_data(carousel, virtual_data):
+def update_map_distrib_data(carousel, grid_rows):
     patched_fig = Patch()
     patched_fig_distrib = Patch()
 
-    if not virtual_data:
+    dff = grid_rows_df('entities', grid_rows)
+    if dff.empty:
         patched_fig["data"][0]['z'] = None
         patched_fig_distrib["data"][0]['x'] = None
         return patched_fig, patched_fig_distrib, None, None
 
-    dff = pd.DataFrame(virtual_data)
-
-    names_column = dff.groupby('Country').apply(
-        lambda x: join_names(x, max_chars_per_line=70)).reset_index()
-    names_column.rename(columns={0: 'Names'}, inplace=True)
-
-    dff = dff.groupby('Country').agg(
-        {'Alpha-3 code': 'first', 'Entity': 'count', '# Approved': 'sum', 'FA Financing': 'sum'}).reset_index()
-
-    dff = pd.merge(dff, names_column, on='Country')
+    # shared by the carousel switches of the same grid rows
+    dff = grid_rows_aggregate('entities', grid_rows, 'map', entities_map_data)
 
     # carousel 0=entities number 1=FA financing 2=FA number
     if carousel == 0:
@@ -177,7 +184,7 @@ def update_map_distrib_data(carousel, virtual_data):
         customdata=list(zip(
             dff['Entity'], dff['# Approved'],
             # use custom function to have $1B instead of $1G, as it is not possible with D3-formatting
-            [format_money_number_si(val) for val in dff['FA Financing']],
+            format_money_numbers_si(dff['FA Financing']),
             dff['Names'], dff['Country'])),
     ))
 
@@ -13,7 +13,7 @@ import dash_ag_grid as dag
 
 import pandas as pd
 
-from app_config import df_entities, PRIMARY_COLOR, format_money_number_si
+from app_config import df_entities, PRIMARY_COLOR, format_money_numbers_si, grid_rows_df, GRID_ROWS_PROP, themed_figure
 
 dff = df_entities.copy()
 dff['DAE'] = dff['DAE'].apply(
@@ -22,52 +22,72 @@ dff['DAE'] = dff['DAE'].apply(
 
 def create_treemap_data(df, levels):
     """
-    Create treemap data dictionary from a dataframe and specified hierarchy levels.
-    Validates levels and handles errors gracefully.
+    Create treemap data dictionary of arrays from a dataframe and specified hierarchy levels.
+    All the nodes of a level are aggregated at once from the codes of their prefix of levels, the nodes being ordered
+    depth first with the children in order of appearance, and missing values dropped with their descendants.
     """
+    keys = ['ids', 'labels', 'parents', 'counts', 'sum_financing', 'sum_number']
     # Validate levels
     if any(level not in df.columns for level in levels):
         raise ValueError("One or more levels are not present in the DataFrame.")
-    if df.empty:
-        return {key: [] for key in ['ids', 'labels', 'parents', 'entities', 'sum_financing', 'sum_number']}
+    if df.empty or not levels:
+        return {key: [] for key in keys}
+
+    financing = df['FA Financing'].fillna(0).to_numpy()
+    number = df['# Approved'].fillna(0).to_numpy()
 
     treemap_data = {
-        'ids': ['Overall'],
-        'labels': ['Overall'],
-        'parents': [''],
-        'counts': [len(df)],
-        'sum_financing': [df['FA Financing'].sum()],
-        'sum_number': [df['# Approved'].sum()]
+        'ids': [np.array(['Overall'], dtype=object)],
+        'labels': [np.array(['Overall'], dtype=object)],
+        'parents': [np.array([''], dtype=object)],
+        'counts': [np.array([len(df)])],
+        'sum_financing': [np.array([financing.sum()])],
+        'sum_number': [np.array([number.sum()])],
     }
-
-    def build_hierarchy(df, current_level=0, parent_ids=""):
-        if current_level < len(levels):
-            level_values = df[levels[current_level]].unique()
-            if len(level_values) == 0:  # Handle empty level
-                return
-
-            for value in level_values:
-                current_id = f"{parent_ids}/{value}"
-                df_current_value = df[df[levels[current_level]] == value]
-
-                # Only add node if it has data
-                if len(df_current_value) > 0:
-                    treemap_data['ids'].append(current_id)
-                    treemap_data['labels'].append(value)
-                    treemap_data['parents'].append(parent_ids)
-                    treemap_data['counts'].append(len(df_current_value))
-                    treemap_data['sum_financing'].append(df_current_value['FA Financing'].sum())
-                    treemap_data['sum_number'].append(df_current_value['# Approved'].sum())
-
-                    build_hierarchy(df_current_value, current_level + 1, current_id)
-
-    build_hierarchy(df, parent_ids="Overall")
+    # node of each row at the current level, -1 when dropped
+    rows_node = np.zeros(len(df), dtype=np.int64)
+    # order of the nodes of the current level: their group number at each level, -1 below their level
+    level_order = np.full((1, len(levels)), -1)
+    nodes_order = [level_order]
+
+    for i, level in enumerate(levels):
+        # codes of the prefix of levels in order of appearance, as the parent node code with the level value code
+        value_codes, values = pd.factorize(df[level])
+        kept = (rows_node >= 0) & (value_codes >= 0)
+        prefix_codes = np.full(len(df), -1, dtype=np.int64)
+        prefix_codes[kept], _ = pd.factorize(rows_node[kept] * len(values) + value_codes[kept])
+
+        nb_nodes = prefix_codes.max() + 1
+        if nb_nodes == 0:  # no more nodes below
+            break
+        _, first_rows = np.unique(prefix_codes, return_index=True)
+        first_rows = first_rows[-nb_nodes:]  # without the dropped rows
+        parents = rows_node[first_rows]
+        labels = values.take(value_codes[first_rows])
+        parent_ids = treemap_data['ids'][-1][parents]
+
+        treemap_data['ids'].append(np.asarray(parent_ids + '/' + labels.astype(str), dtype=object))
+        treemap_data['labels'].append(np.asarray(labels, dtype=object))
+        treemap_data['parents'].append(parent_ids)
+        codes = prefix_codes[kept]
+        treemap_data['counts'].append(np.bincount(codes, minlength=nb_nodes))
+        treemap_data['sum_financing'].append(np.bincount(codes, weights=financing[kept], minlength=nb_nodes))
+        treemap_data['sum_number'].append(
+            np.bincount(codes, weights=number[kept], minlength=nb_nodes).astype(number.dtype))
+
+        level_order = level_order[parents]
+        level_order[:, i] = np.arange(nb_nodes)
+        nodes_order.append(level_order)
+        rows_node = prefix_codes
+
+    # depth first: sort by the group number at each level, a parent (-1 at the levels below) before its children
+    sorter = np.lexsort(np.concatenate(nodes_order).T[::-1])
 
     # Ensure we have at least one node besides root
-    if len(treemap_data['ids']) <= 1:
-        return {key: [] for key in treemap_data.keys()}  # Return empty structure
+    if len(sorter) <= 1:
+        return {key: [] for key in keys}
 
-    return treemap_data
+    return {key: np.concatenate(treemap_data[key])[sorter] for key in keys}
 
 
 treemap_data = create_treemap_data(dff, levels=['DAE', 'Type', 'Sector', 'Size'])
@@ -84,7 +104,7 @@ fig.add_treemap(
         treemap_data['counts'],
         treemap_data['sum_number'],
         # use custom function to have $1B instead of $1G, as it is not possible with D3-formatting
-        [format_money_number_si(val) for val in treemap_data['sum_financing']]
+        format_money_numbers_si(treemap_data['sum_financing'])
     )),
     texttemplate='<span style="font-size: 1.2em"><b>%{label} - %{customdata[0]} Entities</b></span><br>',
     hovertemplate=(
@@ -99,10 +119,14 @@ fig.update_layout(
     treemapcolorway=["#15a14a", "#1569a1"],
 )
 
+# plotly JSON of the figure, shared by the renders that overlay their theme on it
+base_fig = fig.to_plotly_json()
+
 
 def entities_treemap(theme='light'):
-    fig.update_layout(template=pio.templates[f"mantine_{theme}"])
-    fig.update_traces(root_color="rgba(0,0,0,0.1)" if theme == 'light' else "rgba(255,255,255,0.1)")
+    # the root color of the theme overlaid on the treemap trace
+    root_color = "rgba(0,0,0,0.1)" if theme == 'light' else "rgba(255,255,255,0.1)"
+    treemap_trace = {**base_fig['data'][0], 'root': {**base_fig['data'][0].get('root', {}), 'color': root_color}}
     return dmc.Group([
         dmc.Stack([
             dmc.NumberInput(
@@ -138,7 +162,7 @@ def entities_treemap(theme='light'):
         dcc.Graph(
             id={'type': 'figure', 'subtype': 'treemap', 'index': 'entities'},
             config={'displayModeBar': False}, responsive=True,
-            figure=fig,
+            figure=themed_figure({**base_fig, 'data': [treemap_trace]}, theme),
             style={"flex": 1},
         )
     ], p=10, align='stretch', style={"flex": 1})
@@ -146,23 +170,23 @@ def entities_treemap(theme='light'):
 
 @callback(
     Output({'type': 'figure', 'subtype': 'treemap', 'index': 'entities'}, "figure", allow_duplicate=True),
-    Input({'type': 'grid', 'index': 'entities'}, "virtualRowData"),
+    Input({'type': 'grid', 'index': 'entities'}, GRID_ROWS_PROP),
     Input("entities-treemap-values-select", "value"),
     Input({'type': 'grid', 'index': 'entities-levels-drag'}, "virtualRowData"),
     prevent_initial_call=True
 )
-def update_tree_data(virtual_data, selected_value, virtual_data_level):
+def update_tree_data(grid_rows, selected_value, virtual_data_level):
     patched_fig = Patch()
-    if not virtual_data or not virtual_data_level:
+    dff = grid_rows_df('entities', grid_rows)
+    if dff.empty or not virtual_data_level:
         patched_fig["data"][0].update({
             'ids': [], 'labels': [], 'parents': [],
             'values': [], 'text': [], 'customdata': []
         })
         return patched_fig
 
-    dff = pd.DataFrame(virtual_data)
-    dff['DAE'] = dff['DAE'].apply(
-        lambda x: 'Direct Access Entities (DAE)' if x else 'International Accredited Entities (IAE)')
+    dff = dff.assign(DAE=dff['DAE'].apply(
+        lambda x: 'Direct Access Entities (DAE)' if x else 'International Accredited Entities (IAE)'))
 
     levels_order = [row['level'] for row in virtual_data_level]
     treemap_data = create_treemap_data(dff, levels=levels_order)
@@ -176,7 +200,7 @@ def update_tree_data(virtual_data, selected_value, virtual_data_level):
             treemap_data['counts'],
             treemap_data['sum_number'],
             # use custom function to have $1B instead of $1G, as it is not possible with D3-formatting
-            [format_money_number_si(val) for val in treemap_data['sum_financing']],
+            format_money_numbers_si(treemap_data['sum_financing']),
         ))
     ))
 
@@ -10,7 +10,7 @@ import pandas as pd
 from dash import Dash, html, Input, Output, register_page, clientside_callback, dcc, callback, State
 import pages.entities.components as components
 
-from app_config import text_carousel
+from app_config import text_carousel, rendered_children, dashboards_children
 
 register_page(
     __name__,
@@ -20,15 +20,7 @@ register_page(
 layout = dmc.Stack(id='entities-container', w='100%', style={"flex": 1}, align='center')
 
 
-# we use a callback to render the children to be able to provide the theme before they render
-# to avoid flickering at init and when switching dashboard
-@callback(
-    Output('entities-container', "children"),
-    Input('entities-container', "id"),
-    State("color-scheme-switch", "checked"),
-)
-def render_children(_, checked):
-    theme = 'light' if checked else 'dark'
+def entities_children(theme):
     return [
         dmc.Group([
             dmc.Card([
@@ -84,3 +76,18 @@ def render_children(_, checked):
         components.entities_grid(theme)
 
     ]
+
+
+dashboards_children['entities'] = entities_children
+
+
+# we use a callback to render the children to be able to provide the theme before they render
+# to avoid flickering at init and when switching dashboard
+@callback(
+    Output('entities-container', "children"),
+    Input('entities-container', "id"),
+    State("color-scheme-switch", "checked"),
+)
+def render_children(_, checked):
+    theme = 'light' if checked else 'dark'
+    return rendered_children('entities', theme, entities_children)
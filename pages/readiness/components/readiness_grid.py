@@ -9,10 +9,8 @@ import dash_ag_grid as dag
 import dash_mantine_components as dmc
 from dash_iconify import DashIconify
 
-from app_config import df_readiness, header_template_with_icon, query_to_col, col_to_query
-
-# sort by ref for the default order in the grid
-df_readiness.sort_values('Ref #', inplace=True, na_position='last')
+from app_config import df_readiness, header_template_with_icon, query_to_col, col_to_query, \
+    grid_data, grid_rows_props, sort_grid_dates
 
 financing_header_tooltip = '''
   The amount of GCF funding allocated to each country  
@@ -73,6 +71,8 @@ status_col = {'field': 'Status', "cellRenderer": "CustomReadinessStatusCell",
 date_obj = "d3.timeParse('%Y-%m-%dT%H:%M:%S')(params.data['Approved Date'])"
 approved_date_col = {
     'field': 'Approved Date str', 'headerName': 'Approved Date', 'cellStyle': {'textAlign': 'center'},
+    # 'YYYY-MM-DD' str filtered as dates
+    'cellDataType': 'dateString', 'filter': 'agDateColumnFilter',
     "valueFormatter": {"function": f"d3.timeFormat('%b %d, %Y')({date_obj})"},
     'width': 200, "pinned": "right"
 }
@@ -133,7 +133,7 @@ def readiness_grid(theme='light'):
     return html.Div([
         dag.AgGrid(
             id={'type': 'grid', 'index': 'readiness'},
-            rowData=df_readiness.to_dict("records"),
+            **grid_rows_props(df_readiness),
             columnDefs=columnDefs,
             defaultColDef=defaultColDef,
             dashGridOptions=dashGridOptions,
@@ -161,10 +161,12 @@ query_to_col['readiness'] = {
     'LDC': {'field': 'LDC', 'type': 'bool'},
     'AS': {'field': 'AS', 'type': 'bool'},
     'status': {'field': 'Status', 'type': 'text'},
-    # 'approvedDate': {'field': 'Approved Date str', 'type': 'num'},
+    'approvedDate': {'field': 'Approved Date str', 'type': 'date'},
     'financing': {'field': 'Financing', 'type': 'num'},
 }
 col_to_query['readiness'] = {v['field']: k for k, v in query_to_col['readiness'].items()}
+grid_data['readiness'] = df_readiness
+sort_grid_dates(df_readiness, 'Approved Date str')
 
 
 @callback(
@@ -184,35 +186,37 @@ def readiness_status_bar_click(click_data, filter_model):
 
 @callback(
     Output({'type': 'grid', 'index': 'readiness'}, "filterModel", allow_duplicate=True),
-    Input({'type': 'figure', 'subtype': 'line+bar', 'index': 'readiness-timeline'}, "clickData"),
-    Input('readiness-timeline-dropdown', "value"),
+    Input({'type': 'figure', 'subtype': 'line+bar', 'index': 'readiness-timeline'}, "relayoutData"),
     State({'type': 'grid', 'index': 'readiness'}, "filterModel"),
     prevent_initial_call=True
 )
-def readiness_timeline_click(click_data, agg, filter_model):
-    if not click_data:
+def readiness_timeline_zoom(relayout_data, filter_model):
+    # the dates range zoomed on the timeline applied to the grid, removed when resetting the zoom by double click
+    if not relayout_data:
+        return no_update
+    # no model yet when the timeline relayouts before the grid emitted its filter model
+    filter_model = filter_model or {}
+
+    if relayout_data.get('xaxis.autorange'):
+        if 'Approved Date str' not in filter_model:
+            return no_update
+        filter_model.pop('Approved Date str')
+        return filter_model
+
+    date_range = relayout_data.get('xaxis.range') or [relayout_data.get('xaxis.range[0]'),
+                                                       relayout_data.get('xaxis.range[1]')]
+    # other relayouts, like zooming on the y axis or autosize
+    if None in date_range:
         return no_update
 
-    # need to deal with the dates in querry firs
-    # try to use fig zoom to select a date rage that will be applied to the grid
-
-    # line
-    # selected_date = click_data['points'][0]['x']
-
-    # 'curveNumber': 1,
-    # selected_end_date = click_data['points'][0]['x']
-
-    # {"value": "M1", "label": "Month"},
-    # {"value": "M3", "label": "Quarter"},
-    # {"value": "M6", "label": "Half Year"},
-    # {"value": "M12", "label": "Year"},
-    # {"value": "GCF", "label": "GCF Replenishments"},
-
-    # pprint(click_data)
-
-    # filter_model['Status'] = {'filterType': 'text', 'type': 'contains', 'filter': selected_status}
-
-    return no_update
+    # the days fully in the range, as the grid date filter excludes the range bounds
+    date_from = pd.Timestamp(date_range[0]).ceil('D') - pd.Timedelta(days=1)
+    date_to = pd.Timestamp(date_range[1]).floor('D') + pd.Timedelta(days=1)
+    filter_model['Approved Date str'] = {
+        'filterType': 'date', 'type': 'inRange',
+        'dateFrom': date_from.strftime('%Y-%m-%d %H:%M:%S'), 'dateTo': date_to.strftime('%Y-%m-%d %H:%M:%S')
+    }
+    return filter_model
 
 
 @callback(
@@ -8,7 +8,7 @@ import plotly.io as pio
 
 import pandas as pd
 
-from app_config import df_readiness
+from app_config import df_readiness, grid_rows_df, GRID_ROWS_PROP, themed_figure
 
 dff = pd.DataFrame(df_readiness.groupby('Status')['Financing'].sum())
 dff['Number'] = df_readiness['Status'].value_counts()
@@ -49,13 +49,15 @@ fig.update_xaxes(title={'text': 'Financing', 'standoff': 10, 'font_size': 16, 'f
                  fixedrange=True, showgrid=False, showline=True, linewidth=2, ticks="inside", tickprefix='$')
 fig.update_yaxes(showticklabels=False, fixedrange=True, autorange="reversed")
 
+# plotly JSON of the figure, shared by the renders that overlay their theme on it
+base_fig = fig.to_plotly_json()
+
 
 def readiness_status_bar(theme='light'):
-    fig.update_layout(template=pio.templates[f"mantine_{theme}"])
     return dcc.Graph(
         id={'type': 'figure', 'subtype': 'bar', 'index': 'readiness-status'},
         config={'displayModeBar': False}, responsive=True,
-        figure=fig,
+        figure=themed_figure(base_fig, theme),
         style={"flex": 1, 'padding': 10}
     )
 
@@ -63,20 +65,20 @@ def readiness_status_bar(theme='light'):
 @callback(
     Output({'type': 'figure', 'subtype': 'bar', 'index': 'readiness-status'}, "figure", allow_duplicate=True),
     Input("readiness-status-carousel", "active"),
-    Input({'type': 'grid', 'index': 'readiness'}, "virtualRowData"),
+    Input({'type': 'grid', 'index': 'readiness'}, GRID_ROWS_PROP),
     State({'type': 'figure', 'subtype': 'bar', 'index': 'readiness-status'}, "figure"),
     prevent_initial_call=True
 )
-def update_status_data(carousel, virtual_data, fig):
+def update_status_data(carousel, grid_rows, fig):
     patched_fig = Patch()
+    dff_grid = grid_rows_df('readiness', grid_rows)
     # empty figure if there is no data in the grid
-    if not virtual_data:
+    if dff_grid.empty:
         for i, trace in enumerate(fig['data']):
             patched_fig["data"][i].update(dict(x=[0], texttemplate='%{y}', textposition='outside'))
         return patched_fig
 
     # sum financing and number of projects by status
-    dff_grid = pd.DataFrame(virtual_data)
     dff = pd.DataFrame(dff_grid.groupby('Status')['Financing'].sum())
     dff['Number'] = dff_grid['Status'].value_counts()
 
@@ -2,6 +2,7 @@ import os
 from pprint import pprint
 from datetime import timedelta, datetime
 
+import numpy as np
 from dash import dcc, html, Input, Output, State, callback, no_update, clientside_callback, Patch, ctx
 import dash_mantine_components as dmc
 import plotly.graph_objects as go
@@ -9,13 +10,15 @@ import plotly.io as pio
 
 import pandas as pd
 
-from app_config import df_readiness, PRIMARY_COLOR, SECONDARY_COLOR
+from app_config import df_readiness, PRIMARY_COLOR, SECONDARY_COLOR, grid_rows_df, grid_rows_aggregate, \
+    GRID_ROWS_PROP, themed_figure
 
-plotly_to_pandas_period = {
-    'M12': 'YE',
-    'M6': '2QE',
-    'M3': 'QE',
-    'M1': 'ME'
+# number of months of the plotly periods, the bars being counted by calendar period
+plotly_period_months = {
+    'M12': 12,
+    'M6': 6,
+    'M3': 3,
+    'M1': 1
 }
 date_hovertemplate = {
     'GCF': '%{customdata}',
@@ -43,13 +46,75 @@ def set_time_xticks(xrange, agg_period):
 
 agg_init = 'M3'
 
-# sort by date to have the values in the correct order
-dff = df_readiness.sort_values('Approved Date')
-# add cumulated financing for the line
-dff['Cumulative Financing'] = dff['Financing'].cumsum()
+# replenishment periods bins
+replenishment_bins = [datetime(2015, 1, 1), datetime(2020, 1, 1), datetime(2024, 1, 1), datetime(2028, 1, 1)]
+
+# all the rows sorted by date once for all (by 'Ref #' for a same date like in the grid),
+# with their replenishment period
+# Note: sorted in its own frame as df_readiness keeps the grid order (by 'Ref #'), the rows being matched by index
+readiness_by_date = df_readiness[['Approved Date', 'Ref #', 'Financing']].sort_values(['Approved Date', 'Ref #'])
+readiness_by_date['Period'] = pd.cut(
+    readiness_by_date['Approved Date'], bins=replenishment_bins, labels=False, right=False)
+# calendar period code of the rows for each bars granularity, as the number of periods since year 0
+readiness_months = readiness_by_date['Approved Date'].dt.year * 12 + readiness_by_date['Approved Date'].dt.month - 1
+for period, months in plotly_period_months.items():
+    readiness_by_date[period] = readiness_months // months
+
+# the replenishment periods bars are centered in their period
+replenishment_middles = [
+    replenishment_bins[i] + (replenishment_bins[i + 1] - timedelta(days=1) - replenishment_bins[i]) / 2
+    for i in range(len(replenishment_bins) - 1)]
+
+
+def timeline_line_data(df):
+    # the df rows sorted by date with their cumulated financing, overall and by period, from a mask over the presorted
+    # rows instead of sorting the df
+    in_df = np.zeros(len(readiness_by_date), dtype=bool)
+    in_df[readiness_by_date.index.get_indexer(df.index)] = True
+    dff = readiness_by_date[in_df]
+    dff = dff.assign(**{
+        'Cumulative Financing': dff['Financing'].cumsum(),
+        'Period Cumulative Financing': dff.groupby('Period')['Financing'].cumsum(),
+    })
+    return dff
+
+
+def split_line_data(dff):
+    # line of the cumulated financing by period, the periods being separated by None to break the line
+    # and only their last point having a marker and a label
+    dff = dff[dff['Period'].notna()]
+    periods = dff['Period'].to_numpy()
+    # position of the rows in the line, shifted by the number of previous periods separators
+    last_rows = np.append(periods[1:] != periods[:-1], True)
+    positions = np.arange(len(dff)) + np.concatenate([[0], np.cumsum(last_rows[:-1])])
+    line = {key: np.full(len(dff) + last_rows.sum(), None, dtype=object) for key in ['x', 'y', 'opacity', 'text']}
+    # the dates as their ISO str, formatted once by date
+    dates_codes, dates = pd.factorize(dff['Approved Date'].to_numpy())
+    line['x'][positions] = np.datetime_as_string(dates, unit='s').astype(object)[dates_codes]
+    line['y'][positions] = dff['Period Cumulative Financing'].to_numpy(dtype=object)
+    line['opacity'][positions] = last_rows.astype(int)
+    line['text'][positions] = np.where(last_rows, dff['Period Cumulative Financing'].to_numpy(dtype=object), '')
+    return {key: values.tolist() for key, values in line.items()}
+
+
+def timeline_bar_data(dff, agg):
+    # number of projects by period, counted on the period codes of the rows of timeline_line_data()
+    if agg == 'GCF':
+        counts = np.bincount(dff['Period'].dropna().astype(np.int64), minlength=len(replenishment_middles))
+        return pd.DataFrame({'Approved Date': replenishment_middles, 'Number': counts})
+
+    # all the periods from the first to the last row, labelled by their last day like resample()
+    codes = dff[agg].to_numpy()
+    counts = np.bincount(codes - codes.min())
+    next_months = (codes.min() + np.arange(len(counts)) + 1) * plotly_period_months[agg]
+    period_ends = pd.to_datetime(
+        pd.DataFrame({'year': next_months // 12, 'month': next_months % 12 + 1, 'day': 1})) - timedelta(days=1)
+    return pd.DataFrame({'Approved Date': period_ends, 'Number': counts})
+
+
+dff = timeline_line_data(df_readiness)
 # aggregate for bar
-df_timeline_agg = dff.set_index('Approved Date').resample(
-    plotly_to_pandas_period[agg_init]).size().reset_index(name='Number')
+df_timeline_agg = timeline_bar_data(dff, agg_init)
 
 fig = go.Figure()
 fig.add_scatter(
@@ -152,9 +217,11 @@ fig.update_layout(
     yaxis=yaxis, yaxis2=yaxis2,
 )
 
+# plotly JSON of the figure, shared by the renders that overlay their theme on it
+base_fig = fig.to_plotly_json()
+
 
 def readiness_timeline(theme='light'):
-    fig.update_layout(template=pio.templates[f"mantine_{theme}"])
     return dmc.Stack([
         dmc.Group(
             [
@@ -185,7 +252,7 @@ def readiness_timeline(theme='light'):
         dcc.Graph(
             id={'type': 'figure', 'subtype': 'line+bar', 'index': 'readiness-timeline'},
             config={'displayModeBar': False}, responsive=True,
-            figure=fig,
+            figure=themed_figure(base_fig, theme),
             style={"flex": 1}
         )
     ], p=10, style={"flex": 1}
@@ -196,40 +263,26 @@ def readiness_timeline(theme='light'):
     Output({'type': 'figure', 'subtype': 'line+bar', 'index': 'readiness-timeline'}, 'figure', allow_duplicate=True),
     Input('readiness-timeline-dropdown', 'value'),
     Input('readiness-timeline-reple-split-chk', 'checked'),
-    Input({'type': 'grid', 'index': 'readiness'}, "virtualRowData"),
+    Input({'type': 'grid', 'index': 'readiness'}, GRID_ROWS_PROP),
     prevent_initial_call=True,
 )
-def update_data(agg, split_line, virtual_data):
+def update_data(agg, split_line, grid_rows):
     # empty figure if there is no data in the grid
     patched_fig = Patch()
-    if not virtual_data:
+    dff = grid_rows_df('readiness', grid_rows)
+    if dff.empty:
         patched_fig["data"][0].update({'x': None, 'y': None})
         patched_fig["data"][1].update({'x': None, 'y': None})
         return patched_fig
 
-    dff = pd.DataFrame(virtual_data)
-    # convert back from date string from the grid to datetime
-    dff['Approved Date'] = pd.to_datetime(dff['Approved Date'])
-    dff.sort_values('Approved Date', inplace=True)  # sort by date to have the values in the correct order
-    dff['Cumulative Financing'] = dff['Financing'].cumsum()  # add cumulated financing for the line
+    # sorted rows with their cumulated financing, shared by the split toggle and the agg select of the same grid rows
+    dff = grid_rows_aggregate('readiness', grid_rows, 'timeline', timeline_line_data)
 
     # Line patch
     if split_line:
-        x_data, y_data, marker_opacity, text_data = [], [], [], []
-
-        bins = [datetime(2015, 1, 1), datetime(2020, 1, 1), datetime(2024, 1, 1), datetime(2028, 1, 1)]
-
-        for i in range(len(bins) - 1):
-            mask = (dff['Approved Date'] >= bins[i]) & (dff['Approved Date'] < bins[i + 1])
-            period_data = dff.loc[mask].copy()  # Creating a copy to avoid SettingWithCopyWarning
-            period_data['Cumulative Financing'] = period_data['Financing'].cumsum()
-            x_data += period_data['Approved Date'].tolist() + [None]
-            y_data += period_data['Cumulative Financing'].tolist() + [None]
-            marker_opacity += [0] * (len(period_data) - 1) + [1, None]
-            text_data += [''] * (len(period_data) - 1) + [period_data['Cumulative Financing'].iloc[-1]] + [None]
-
+        line = split_line_data(dff)
         patched_fig["data"][0].update(dict(
-            x=x_data, y=y_data, marker={'opacity': marker_opacity}, text=text_data,
+            x=line['x'], y=line['y'], marker={'opacity': line['opacity']}, text=line['text'],
         ))
 
     else:
@@ -239,20 +292,13 @@ def update_data(agg, split_line, virtual_data):
             text=[''] * (len(dff) - 1) + [dff['Cumulative Financing'].iloc[-1]],
         ))
 
-    # bar patch
+    # bar patch, counted on the period codes precomputed for each granularity
+    dff_agg = timeline_bar_data(dff, agg)
     if agg == 'GCF':
         # As the periods are not constant, we can't use xperiod, so will use custom bar width and custom x
-        bins = [datetime(2015, 1, 1), datetime(2020, 1, 1), datetime(2024, 1, 1), datetime(2028, 1, 1)]
+        bins = replenishment_bins
         widths = [(bins[i + 1] - timedelta(days=1) - bins[i]).total_seconds() * 1000 * 0.95 for i in
                   range(len(bins) - 1)]
-        period_middles = [bins[i] + (bins[i + 1] - timedelta(days=1) - bins[i]) / 2 for i in range(len(bins) - 1)]
-        # will assign the middle date on each row in the corresponding period
-        dff['Middle Date'] = pd.cut(dff['Approved Date'], bins=bins, labels=False, right=False).map(
-            dict(enumerate(period_middles)))
-        # Group by the custom periods and count the occurrences to have the number of projects
-        dff_agg = dff.groupby('Middle Date').size().reset_index(name='Number')
-        # rename the col to use it as x below
-        dff_agg = dff_agg.rename(columns={'Middle Date': 'Approved Date'})
 
         patched_fig["data"][1]['width'] = widths
         # remove the xperiod to not mess with the bar offset
@@ -263,8 +309,6 @@ def update_data(agg, split_line, virtual_data):
         patched_fig["layout"]["yaxis2"]['autorange'] = False
         patched_fig["layout"]["yaxis2"]['range'] = [0, 500]
     else:
-        dff_agg = dff.set_index('Approved Date').resample(
-            plotly_to_pandas_period[agg]).size().reset_index(name='Number')
         patched_fig["data"][1]['xperiod'] = agg
         # remove the custom width and y range if set previously selecting agg='GCF'
         patched_fig["data"][1]['width'] = None
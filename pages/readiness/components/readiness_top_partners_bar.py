@@ -8,7 +8,8 @@ import plotly.io as pio
 
 import pandas as pd
 
-from app_config import df_readiness, df_entities, PRIMARY_COLOR
+from app_config import df_readiness, df_entities, PRIMARY_COLOR, grid_rows_df, grid_rows_aggregate, GRID_ROWS_PROP, \
+    themed_figure
 
 
 def hovertext_format(row):
@@ -22,15 +23,24 @@ def hovertext_format(row):
     return ''.join(lines)
 
 
-# Group by 'Delivery Partner' and get both the sum of 'Financing' and the size of each group
-dff = df_readiness.groupby('Delivery Partner').agg({
-    'Financing': 'sum', 'Delivery Partner': 'size',
-    # to keep the info of each partner
-    **{col: 'first' for col in ['Partner Name', 'Partner Country', 'DAE', 'Type', 'Size', 'Sector']}
-})
-dff = dff.rename(columns={'Delivery Partner': 'Number'})
-top_partners = dff.sort_values('Financing', ascending=False).head(10)
-top_partners['hovertext'] = top_partners.apply(hovertext_format, axis=1)
+# the info of each partner, the same on all its rows as merged from the entities
+partners_info = df_readiness.groupby('Delivery Partner')[
+    ['Partner Name', 'Partner Country', 'DAE', 'Type', 'Size', 'Sector']].first()
+
+
+# Group by 'Delivery Partner' and get both the sum of 'Financing' and the size of each group, with the partners info
+def partners_data(df):
+    dff = df.groupby('Delivery Partner').agg(Financing=('Financing', 'sum'), Number=('Financing', 'size'))
+    return dff.join(partners_info)
+
+
+def top_partners_data(dff, data_col, n_top):
+    # the n_top partners without sorting all of them, the hover text being only built for them
+    top_partners = dff.nlargest(n_top, data_col)
+    return top_partners.assign(hovertext=top_partners.apply(hovertext_format, axis=1))
+
+
+top_partners = top_partners_data(partners_data(df_readiness), 'Financing', 10)
 
 fig = go.Figure()
 fig.add_bar(
@@ -61,13 +71,15 @@ fig.update_xaxes(title={'text': 'Financing', 'standoff': 10, 'font_size': 16, 'f
                  fixedrange=True, showgrid=False, showline=True, linewidth=2, ticks="inside", tickprefix='$')
 fig.update_yaxes(showticklabels=False, autorange="reversed")
 
+# plotly JSON of the figure, shared by the renders that overlay their theme on it
+base_fig = fig.to_plotly_json()
+
 
 def readiness_top_partners_bar(theme='light'):
-    fig.update_layout(template=pio.templates[f"mantine_{theme}"])
     return dcc.Graph(
         id={'type': 'figure', 'subtype': 'bar', 'index': 'readiness-top-partners'},
         config={'displayModeBar': False}, responsive=True,
-        figure=fig,
+        figure=themed_figure(base_fig, theme),
         style={"flex": 1, 'padding': 10}
     )
 
@@ -76,27 +88,22 @@ def readiness_top_partners_bar(theme='light'):
     Output({'type': 'figure', 'subtype': 'bar', 'index': 'readiness-top-partners'}, "figure", allow_duplicate=True),
     Input("readiness-top-partners-carousel", "active"),
     Input("readiness-top-partners-input", "value"),
-    Input({'type': 'grid', 'index': 'readiness'}, "virtualRowData"),
+    Input({'type': 'grid', 'index': 'readiness'}, GRID_ROWS_PROP),
     prevent_initial_call=True
 )
-def update_status_data(carousel, n_top, virtual_data):
-    if not virtual_data:
+def update_status_data(carousel, n_top, grid_rows):
+    dff_grid = grid_rows_df('readiness', grid_rows)
+    if dff_grid.empty:
         patched_fig = Patch()
         patched_fig["data"][0].update({'x': None, 'y': None})
         return patched_fig
 
-    # sum financing and number of projects by status
-    dff_grid = pd.DataFrame(virtual_data)
-    dff = dff_grid.groupby('Delivery Partner').agg({
-        'Financing': 'sum', 'Delivery Partner': 'size',
-        **{col: 'first' for col in ['Partner Name', 'Partner Country', 'DAE', 'Type', 'Size', 'Sector']}
-    })
-    dff = dff.rename(columns={'Delivery Partner': 'Number'})
+    # sum financing and number of projects by partner, shared by the carousel and n_top changes of the same grid rows
+    dff = grid_rows_aggregate('readiness', grid_rows, 'top-partners', partners_data)
 
     # carousel 0=Financing 1=Number
     data_col = 'Number' if carousel else 'Financing'
-    top_partners = dff.sort_values(data_col, ascending=False).head(n_top)
-    top_partners['hovertext'] = top_partners.apply(hovertext_format, axis=1)
+    top_partners = top_partners_data(dff, data_col, n_top)
 
     x = '%{x} Projects' if carousel else '%{x:$.4s}'
     customdata = '%{customdata[0]:$.4s}' if carousel else '%{customdata[1]}'
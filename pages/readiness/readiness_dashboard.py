@@ -9,7 +9,7 @@ from dash_iconify import DashIconify
 import pandas as pd
 
 import pages.readiness.components as components
-from app_config import text_carousel
+from app_config import text_carousel, rendered_children, dashboards_children
 
 # Seeds of Climate Action: Readiness Programme Flow of Funds
 register_page(__name__, path="/readiness")
@@ -17,15 +17,7 @@ register_page(__name__, path="/readiness")
 layout = dmc.Stack(id='readiness-container', w='100%', style={"flex": 1}, align='center')
 
 
-# we use a callback to render the children to be able to provide the theme before they render
-# to avoid flickering at init and when switching dashboard
-@callback(
-    Output('readiness-container', "children"),
-    Input('readiness-container', "id"),
-    State("color-scheme-switch", "checked"),
-)
-def render_children(_, checked):
-    theme = 'light' if checked else 'dark'
+def readiness_children(theme):
     return [
         # dmc.Group([
         #     dmc.Card([
@@ -129,3 +121,18 @@ def render_children(_, checked):
         components.readiness_grid(theme)
 
     ]
+
+
+dashboards_children['readiness'] = readiness_children
+
+
+# we use a callback to render the children to be able to provide the theme before they render
+# to avoid flickering at init and when switching dashboard
+@callback(
+    Output('readiness-container', "children"),
+    Input('readiness-container', "id"),
+    State("color-scheme-switch", "checked"),
+)
+def render_children(_, checked):
+    theme = 'light' if checked else 'dark'
+    return rendered_children('readiness', theme, readiness_children)
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# the app modules are imported from the project root, where the datasets folders are resolved
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
@@ -0,0 +1,49 @@
+"""
+Cache headers and conditional requests of the server, compressed or not.
+"""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# run in a fresh interpreter, as Dash reads its routes prefix from DASH_URL_BASE_PATHNAME when the app is created
+script = """
+import json
+from app import app, server
+
+prefix = app.config.routes_pathname_prefix
+client = server.test_client()
+result = {}
+for encoding in ['br', 'gzip', 'identity']:
+    response = client.get(prefix + '_dash-layout', headers={'Accept-Encoding': encoding})
+    revalidation = client.get(
+        prefix + '_dash-layout', headers={'Accept-Encoding': encoding, 'If-None-Match': response.headers['ETag']})
+    result[encoding] = {
+        'encoding': response.headers.get('Content-Encoding'), 'cache_control': response.headers['Cache-Control'],
+        'revalidation_status': revalidation.status_code, 'revalidation_size': len(revalidation.data),
+    }
+asset = client.get(prefix + 'assets/custom_styles.css?m=1', headers={'Accept-Encoding': 'br'})
+result['asset'] = {'status': asset.status_code, 'cache_control': asset.headers.get('Cache-Control')}
+asset.close()
+print(json.dumps(result))
+"""
+
+
+@pytest.mark.parametrize('base_pathname', ['/', '/gcf/'])
+def test_cache_headers(base_pathname):
+    env = {**os.environ, 'DASH_URL_BASE_PATHNAME': base_pathname}
+    res = subprocess.run([sys.executable, '-c', script], cwd=ROOT, env=env, capture_output=True, text=True)
+    assert res.returncode == 0, res.stderr
+    result = json.loads(res.stdout.strip().splitlines()[-1])
+
+    for encoding in ['br', 'gzip', 'identity']:
+        assert result[encoding]['encoding'] == (None if encoding == 'identity' else encoding)
+        assert result[encoding]['cache_control'] == 'no-cache'
+        assert result[encoding]['revalidation_status'] == 304
+        assert result[encoding]['revalidation_size'] == 0
+    assert result['asset']['status'] == 200
+    assert 'immutable' in result['asset']['cache_control']
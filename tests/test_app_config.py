@@ -0,0 +1,118 @@
+"""
+The vectorized columns of prepare_datasets() compared with the per-row lambdas they replaced.
+"""
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app_config import assets_folder, datasets_sources, prepare_datasets, filter_to_query, query_to_filter, filter_df, \
+    grid_rows_df, countries_cube_sums, CHARTS_FROM_FILTER_MODEL
+
+region_sum_cols = ['# RP', '# FA', 'RP Financing $', 'FA Financing $']
+
+
+def region_sums_per_row(df_countries):
+    region_sum = df_countries.groupby('Region')[region_sum_cols].sum()
+    return pd.DataFrame({
+        f'{col} region_sum': df_countries['Region'].apply(lambda row: region_sum[col][row])
+        for col in region_sum_cols
+    })
+
+
+def priority_states_per_row(df_FA, df_countries):
+    priority_countries = df_countries[df_countries['Priority States']]['Country Name'].tolist()
+    return df_FA['Countries'].apply(
+        lambda countries: any(country.strip() in priority_countries for country in countries.split(','))
+    )
+
+
+def multi_country_per_row(df_FA):
+    return df_FA['Countries'].apply(lambda countries: len(countries.split(',')) > 1)
+
+
+@pytest.fixture(scope='module')
+def datasets():
+    return prepare_datasets(assets_folder)
+
+
+@pytest.fixture(scope='module')
+def missing_countries_datasets(tmp_path_factory):
+    # the shipped sources with FA projects without countries, or with blank items in their list
+    folder = tmp_path_factory.mktemp('assets')
+    for source in datasets_sources:
+        shutil.copy(f'{assets_folder}/{source}', folder)
+    df_FA = pd.read_csv(f'{folder}/GCF-FA.csv')
+    df_FA.loc[0:1, 'Countries'] = np.nan
+    df_FA.loc[2, 'Countries'] = ' '
+    df_FA.loc[3, 'Countries'] = ','
+    df_FA.loc[4, 'Countries'] = df_FA.loc[4, 'Countries'] + ', '
+    df_FA.to_csv(f'{folder}/GCF-FA.csv', index=False)
+    return prepare_datasets(folder)
+
+
+def test_region_sums(datasets):
+    df_countries = datasets['df_countries']
+    expected = region_sums_per_row(df_countries)
+    pd.testing.assert_frame_equal(df_countries[expected.columns], expected)
+
+
+def test_fa_countries(datasets):
+    df_FA, df_countries = datasets['df_FA'], datasets['df_countries']
+    pd.testing.assert_series_equal(
+        df_FA['Priority States'], priority_states_per_row(df_FA, df_countries), check_names=False)
+    pd.testing.assert_series_equal(df_FA['Multi Country'], multi_country_per_row(df_FA), check_names=False)
+
+
+def test_fa_missing_countries(missing_countries_datasets):
+    df_FA, df_countries = missing_countries_datasets['df_FA'], missing_countries_datasets['df_countries']
+    missing = df_FA['Countries'].isna()
+    assert missing.sum() == 2
+    # the lambdas raised on the missing countries, which are now neither priority states nor multi country
+    assert not df_FA.loc[missing, 'Priority States'].any()
+    assert not df_FA.loc[missing, 'Multi Country'].any()
+
+    dff = df_FA[~missing]
+    pd.testing.assert_series_equal(
+        dff['Priority States'], priority_states_per_row(dff, df_countries), check_names=False)
+    pd.testing.assert_series_equal(dff['Multi Country'], multi_country_per_row(dff), check_names=False)
+    assert dff['Countries'].isin([' ', ',']).sum() == 2
+
+
+def test_number_and_conditions_query():
+    from pages.FA.components.fa_grid import query_to_col, col_to_query, df_FA, fa_histogram_click
+    from pages.FA.components.fa_histogram import histogram_data, bins_number_list
+
+    # each bin clicked on the FA histogram is kept in the url and filters the rows of the bin
+    for max_bins in bins_number_list:
+        bins = histogram_data(df_FA, max_bins)
+        for left, right, number in zip(bins['left'], bins['right'], bins['Number']):
+            filter_model = fa_histogram_click({'points': [{'customdata': [left, right, '']}]}, {})
+            query = filter_to_query(filter_model, col_to_query['fa'])
+            assert query_to_filter(query, query_to_col['fa']) == filter_model
+            assert len(filter_df(df_FA, filter_model)) == number
+
+    # the other multi conditions can't be written as a query
+    filter_model = {'FA Financing': {'filterType': 'number', 'operator': 'OR', 'conditions': [
+        {'filterType': 'number', 'type': 'equals', 'filter': 1}, {'filterType': 'number', 'type': 'equals', 'filter': 2}
+    ]}}
+    assert filter_to_query(filter_model, col_to_query['fa']) == '?'
+    query = '?FAfin=10&FAfinOperator=greaterThan&FAfin=x&FAfinOperator=lessThan'
+    assert query_to_filter(query, query_to_col['fa']) == {}
+
+
+@pytest.mark.skipif(CHARTS_FROM_FILTER_MODEL, reason='the grid rows are the virtualRowData')
+def test_grid_rows_unknown_row_id():
+    from pages.country.components.countries_grid import df_countries
+
+    known = df_countries.index[[0, 5, 2]]
+    unknown = df_countries.index.max() + 1
+    rows = grid_rows_df('countries', [{'Row Id': int(row_id)} for row_id in known])
+    assert list(rows.index) == list(known)
+
+    # like the rows of a browser tab kept open across a datasets update, not mapped to the last row
+    rows = grid_rows_df('countries', [{'Row Id': int(row_id)} for row_id in known] + [{'Row Id': int(unknown)}])
+    assert rows.empty
+    assert countries_cube_sums(pd.Index([unknown])).empty
+    pd.testing.assert_frame_equal(countries_cube_sums(known.append(pd.Index([unknown]))), countries_cube_sums(known))
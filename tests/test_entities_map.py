@@ -0,0 +1,46 @@
+"""
+Hover names of the entities map compared with the per-group join they replaced.
+"""
+import pandas as pd
+import pytest
+
+from pages.entities.components.entities_map import df_entities, entities_map_data
+
+
+def join_names_per_group(group, max_chars_per_line=70):
+    names = []
+    for entity, name in zip(group['Entity'], group['Name']):
+        item = f"<b>{entity}</b> ({name})"
+        if len(item) > max_chars_per_line:
+            item = item[:max_chars_per_line - 3] + "..."
+        names.append(item)
+    return '<br>'.join(names)
+
+
+@pytest.mark.parametrize('sort', [None, 'Name', 'FA Financing', 'Type'])
+@pytest.mark.parametrize('rows', ['full', 'national', 'every other row'])
+def test_map_names(rows, sort):
+    df = {
+        'full': df_entities,
+        'national': df_entities[df_entities['Type'].str.contains('National')],
+        'every other row': df_entities.iloc[::2],
+    }[rows]
+    if sort:  # grid rows sorted by a column, descending like a click on its header
+        df = df.sort_values(sort, ascending=False, kind='stable')
+
+    # the names of each country in the order of df_entities, whatever the order of the grid rows
+    expected = df.loc[df_entities.index.intersection(df.index, sort=False)].groupby('Country').apply(
+        join_names_per_group, include_groups=False)
+    pd.testing.assert_series_equal(
+        entities_map_data(df).set_index('Country')['Names'], expected, check_names=False)
+
+
+def test_map_names_filtered_country():
+    # a country with several entities, its names keep the same order with one of them filtered out
+    country = df_entities['Country'].value_counts().index[0]
+    df = df_entities.sort_values('Name', ascending=False)
+    names = entities_map_data(df).set_index('Country').loc[country, 'Names'].split('<br>')
+    filtered_names = entities_map_data(df.drop(df.index[df['Country'] == country][0])).set_index('Country').loc[
+        country, 'Names'].split('<br>')
+    assert len(filtered_names) == len(names) - 1
+    assert [name for name in names if name in filtered_names] == filtered_names
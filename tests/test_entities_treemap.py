@@ -0,0 +1,90 @@
+"""
+create_treemap_data() compared with the recursive builder it replaced.
+"""
+from itertools import permutations
+
+import numpy as np
+import pytest
+
+from pages.entities.components.entities_treemap import create_treemap_data, dff
+
+keys = ['ids', 'labels', 'parents', 'counts', 'sum_financing', 'sum_number']
+level_orders = [
+    ['DAE', 'Type', 'Sector', 'Size'], ['Size', 'Sector', 'Type', 'DAE'], ['Type'], ['Sector', 'Stage'],
+    *permutations(['Country', 'Type', 'Size']),
+]
+
+
+def create_treemap_data_recursive(df, levels):
+    if df.empty:
+        return {key: [] for key in keys}
+
+    treemap_data = {
+        'ids': ['Overall'],
+        'labels': ['Overall'],
+        'parents': [''],
+        'counts': [len(df)],
+        'sum_financing': [df['FA Financing'].sum()],
+        'sum_number': [df['# Approved'].sum()]
+    }
+
+    def build_hierarchy(df, current_level=0, parent_ids=""):
+        if current_level < len(levels):
+            level_values = df[levels[current_level]].unique()
+            if len(level_values) == 0:
+                return
+
+            for value in level_values:
+                current_id = f"{parent_ids}/{value}"
+                df_current_value = df[df[levels[current_level]] == value]
+
+                if len(df_current_value) > 0:
+                    treemap_data['ids'].append(current_id)
+                    treemap_data['labels'].append(value)
+                    treemap_data['parents'].append(parent_ids)
+                    treemap_data['counts'].append(len(df_current_value))
+                    treemap_data['sum_financing'].append(df_current_value['FA Financing'].sum())
+                    treemap_data['sum_number'].append(df_current_value['# Approved'].sum())
+
+                    build_hierarchy(df_current_value, current_level + 1, current_id)
+
+    build_hierarchy(df, parent_ids="Overall")
+
+    if len(treemap_data['ids']) <= 1:
+        return {key: [] for key in keys}
+    return treemap_data
+
+
+def with_missing_values(df):
+    # a missing value at some rows of each level, dropped with their descendants
+    df = df.copy()
+    for i, col in enumerate(['DAE', 'Type', 'Sector', 'Size', 'Country']):
+        df.loc[df.index[i::7], col] = np.nan
+    return df
+
+
+@pytest.mark.parametrize('entities', ['full', 'national', 'DAE', 'missing values', 'one row'])
+@pytest.mark.parametrize('levels', level_orders, ids='/'.join)
+def test_treemap_data(entities, levels):
+    df = {
+        'full': dff,
+        'national': dff[dff['Type'].str.contains('National')],
+        'DAE': dff[dff['DAE'].str.startswith('Direct')],
+        'missing values': with_missing_values(dff),
+        'one row': dff.iloc[[3]],
+    }[entities]
+    levels = list(levels)
+
+    expected = create_treemap_data_recursive(df, levels)
+    treemap_data = create_treemap_data(df, levels)
+
+    assert len(expected['ids']) > 1
+    for key in ['ids', 'labels', 'parents', 'counts', 'sum_number']:
+        assert list(treemap_data[key]) == list(expected[key]), key
+    np.testing.assert_allclose(treemap_data['sum_financing'], expected['sum_financing'], rtol=1e-12)
+
+
+def test_treemap_data_empty():
+    assert create_treemap_data(dff.iloc[:0], ['Type']) == {key: [] for key in keys}
+    with pytest.raises(ValueError):
+        create_treemap_data(dff, ['Unknown'])